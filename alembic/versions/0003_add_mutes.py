@@ -0,0 +1,45 @@
+"""add mutes table
+
+Revision ID: 0003_add_mutes
+Revises: 0002_add_math_duels
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy import inspect
+
+# revision identifiers, used by Alembic.
+revision = '0003_add_mutes'
+down_revision = '0002_add_math_duels'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    conn = op.get_bind()
+    inspector = inspect(conn)
+    tables = inspector.get_table_names()
+
+    if 'mutes' not in tables:
+        op.create_table(
+            'mutes',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('chat_id', sa.BigInteger(), nullable=False),
+            sa.Column('user_id', sa.BigInteger(), nullable=False),
+            sa.Column('until', sa.DateTime(), nullable=False),
+            sa.Column('reason', sa.String(length=50), nullable=True),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+        )
+        op.create_index('ix_mutes_chat_id', 'mutes', ['chat_id'], unique=False)
+        op.create_index('ix_mutes_user_id', 'mutes', ['user_id'], unique=False)
+    else:
+        indexes = [idx['name'] for idx in inspector.get_indexes('mutes')]
+        for idx_name, col_name in [('ix_mutes_chat_id', 'chat_id'), ('ix_mutes_user_id', 'user_id')]:
+            if idx_name not in indexes:
+                op.create_index(idx_name, 'mutes', [col_name], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_mutes_user_id', table_name='mutes')
+    op.drop_index('ix_mutes_chat_id', table_name='mutes')
+    op.drop_table('mutes')
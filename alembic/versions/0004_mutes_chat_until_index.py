@@ -0,0 +1,31 @@
+"""mutes: composite index on (chat_id, until)
+
+Revision ID: 0004_mutes_chat_until_index
+Revises: 0003_add_mutes
+Create Date: 2026-10-17
+"""
+from alembic import op
+from sqlalchemy import inspect
+
+# revision identifiers, used by Alembic.
+revision = '0004_mutes_chat_until_index'
+down_revision = '0003_add_mutes'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    conn = op.get_bind()
+    inspector = inspect(conn)
+    indexes = [idx['name'] for idx in inspector.get_indexes('mutes')]
+
+    if 'ix_mutes_chat_id_until' not in indexes:
+        op.create_index('ix_mutes_chat_id_until', 'mutes', ['chat_id', 'until'], unique=False)
+    # Составной индекс покрывает поиск по chat_id
+    if 'ix_mutes_chat_id' in indexes:
+        op.drop_index('ix_mutes_chat_id', table_name='mutes')
+
+
+def downgrade() -> None:
+    op.create_index('ix_mutes_chat_id', 'mutes', ['chat_id'], unique=False)
+    op.drop_index('ix_mutes_chat_id_until', table_name='mutes')
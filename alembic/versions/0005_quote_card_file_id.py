@@ -0,0 +1,28 @@
+"""quotes: card_file_id for cached !мудрость cards
+
+Revision ID: 0005_quote_card_file_id
+Revises: 0004_mutes_chat_until_index
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy import inspect
+
+# revision identifiers, used by Alembic.
+revision = '0005_quote_card_file_id'
+down_revision = '0004_mutes_chat_until_index'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    conn = op.get_bind()
+    inspector = inspect(conn)
+    columns = [col['name'] for col in inspector.get_columns('quotes')]
+
+    if 'card_file_id' not in columns:
+        op.add_column('quotes', sa.Column('card_file_id', sa.String(length=255), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('quotes', 'card_file_id')
@@ -0,0 +1,32 @@
+"""users: unique index on full_name for bulk upsert from Excel
+
+Revision ID: 0006_users_full_name_unique
+Revises: 0005_quote_card_file_id
+Create Date: 2026-10-17
+"""
+from alembic import op
+from sqlalchemy import inspect
+
+# revision identifiers, used by Alembic.
+revision = '0006_users_full_name_unique'
+down_revision = '0005_quote_card_file_id'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    conn = op.get_bind()
+    inspector = inspect(conn)
+    indexes = {idx['name']: idx for idx in inspector.get_indexes('users')}
+
+    # ON CONFLICT (full_name) требует уникального индекса
+    index = indexes.get('ix_users_full_name')
+    if index is None or not index.get('unique'):
+        if index is not None:
+            op.drop_index('ix_users_full_name', table_name='users')
+        op.create_index('ix_users_full_name', 'users', ['full_name'], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_users_full_name', table_name='users')
+    op.create_index('ix_users_full_name', 'users', ['full_name'], unique=False)
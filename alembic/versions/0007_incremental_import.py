@@ -0,0 +1,41 @@
+"""incremental Excel import: users.row_hash and import_state
+
+Revision ID: 0007_incremental_import
+Revises: 0006_users_full_name_unique
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy import inspect
+
+# revision identifiers, used by Alembic.
+revision = '0007_incremental_import'
+down_revision = '0006_users_full_name_unique'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    conn = op.get_bind()
+    inspector = inspect(conn)
+    tables = inspector.get_table_names()
+
+    columns = [col['name'] for col in inspector.get_columns('users')]
+    if 'row_hash' not in columns:
+        op.add_column('users', sa.Column('row_hash', sa.String(length=64), nullable=True))
+
+    if 'import_state' not in tables:
+        op.create_table(
+            'import_state',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('source', sa.String(length=512), nullable=False),
+            sa.Column('mtime', sa.Float(), nullable=False),
+            sa.Column('digest', sa.String(length=64), nullable=False),
+            sa.Column('imported_at', sa.DateTime(), nullable=True),
+            sa.UniqueConstraint('source', name='uq_import_state_source'),
+        )
+
+
+def downgrade() -> None:
+    op.drop_table('import_state')
+    op.drop_column('users', 'row_hash')
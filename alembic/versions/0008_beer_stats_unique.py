@@ -0,0 +1,47 @@
+"""beer_stats: unique index on (chat_id, user_id) for atomic upsert
+
+Revision ID: 0008_beer_stats_unique
+Revises: 0007_incremental_import
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy import inspect
+
+# revision identifiers, used by Alembic.
+revision = '0008_beer_stats_unique'
+down_revision = '0007_incremental_import'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    conn = op.get_bind()
+    inspector = inspect(conn)
+    indexes = [idx['name'] for idx in inspector.get_indexes('beer_stats')]
+
+    if 'ix_beer_stats_chat_id_user_id' not in indexes:
+        # Сливаем дубли, появившиеся из-за гонок: сумма счётчиков остаётся в строке с минимальным id
+        op.execute(sa.text(
+            "UPDATE beer_stats SET count = ("
+            "  SELECT SUM(b2.count) FROM beer_stats b2"
+            "  WHERE b2.chat_id = beer_stats.chat_id AND b2.user_id = beer_stats.user_id"
+            ") WHERE id IN ("
+            "  SELECT MIN(id) FROM beer_stats GROUP BY chat_id, user_id HAVING COUNT(*) > 1"
+            ")"
+        ))
+        op.execute(sa.text(
+            "DELETE FROM beer_stats WHERE id NOT IN ("
+            "  SELECT keep_id FROM (SELECT MIN(id) AS keep_id FROM beer_stats GROUP BY chat_id, user_id) AS keep"
+            ")"
+        ))
+        op.create_index('ix_beer_stats_chat_id_user_id', 'beer_stats', ['chat_id', 'user_id'], unique=True)
+
+    # Составной индекс покрывает поиск по chat_id
+    if 'ix_beer_stats_chat_id' in indexes:
+        op.drop_index('ix_beer_stats_chat_id', table_name='beer_stats')
+
+
+def downgrade() -> None:
+    op.create_index('ix_beer_stats_chat_id', 'beer_stats', ['chat_id'], unique=False)
+    op.drop_index('ix_beer_stats_chat_id_user_id', table_name='beer_stats')
@@ -0,0 +1,27 @@
+"""beer_stats: index on (chat_id, count) for the chat leaderboard
+
+Revision ID: 0009_beer_stats_chat_count
+Revises: 0008_beer_stats_unique
+Create Date: 2026-10-17
+"""
+from alembic import op
+from sqlalchemy import inspect
+
+# revision identifiers, used by Alembic.
+revision = '0009_beer_stats_chat_count'
+down_revision = '0008_beer_stats_unique'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    conn = op.get_bind()
+    inspector = inspect(conn)
+    indexes = [idx['name'] for idx in inspector.get_indexes('beer_stats')]
+
+    if 'ix_beer_stats_chat_id_count' not in indexes:
+        op.create_index('ix_beer_stats_chat_id_count', 'beer_stats', ['chat_id', 'count'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_beer_stats_chat_id_count', table_name='beer_stats')
@@ -0,0 +1,37 @@
+"""math_duels: index on (chat_id, expired, created_at) for time-bounded duels
+
+Revision ID: 0010_math_duels_active_index
+Revises: 0009_beer_stats_chat_count
+Create Date: 2026-10-17
+"""
+from alembic import op
+from sqlalchemy import inspect
+
+# revision identifiers, used by Alembic.
+revision = '0010_math_duels_active_index'
+down_revision = '0009_beer_stats_chat_count'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    conn = op.get_bind()
+    inspector = inspect(conn)
+    indexes = [idx['name'] for idx in inspector.get_indexes('math_duels')]
+
+    if 'ix_math_duels_chat_id_expired_created_at' not in indexes:
+        op.create_index(
+            'ix_math_duels_chat_id_expired_created_at',
+            'math_duels',
+            ['chat_id', 'expired', 'created_at'],
+            unique=False
+        )
+
+    # Составной индекс покрывает поиск по chat_id
+    if 'ix_math_duels_chat_id' in indexes:
+        op.drop_index('ix_math_duels_chat_id', table_name='math_duels')
+
+
+def downgrade() -> None:
+    op.create_index('ix_math_duels_chat_id', 'math_duels', ['chat_id'], unique=False)
+    op.drop_index('ix_math_duels_chat_id_expired_created_at', table_name='math_duels')
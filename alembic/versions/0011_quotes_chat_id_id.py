@@ -0,0 +1,32 @@
+"""quotes: index on (chat_id, id) for random quote selection
+
+Revision ID: 0011_quotes_chat_id_id
+Revises: 0010_math_duels_active_index
+Create Date: 2026-10-17
+"""
+from alembic import op
+from sqlalchemy import inspect
+
+# revision identifiers, used by Alembic.
+revision = '0011_quotes_chat_id_id'
+down_revision = '0010_math_duels_active_index'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    conn = op.get_bind()
+    inspector = inspect(conn)
+    indexes = [idx['name'] for idx in inspector.get_indexes('quotes')]
+
+    if 'ix_quotes_chat_id_id' not in indexes:
+        op.create_index('ix_quotes_chat_id_id', 'quotes', ['chat_id', 'id'], unique=False)
+
+    # Составной индекс покрывает поиск по chat_id
+    if 'ix_quotes_chat_id' in indexes:
+        op.drop_index('ix_quotes_chat_id', table_name='quotes')
+
+
+def downgrade() -> None:
+    op.create_index('ix_quotes_chat_id', 'quotes', ['chat_id'], unique=False)
+    op.drop_index('ix_quotes_chat_id_id', table_name='quotes')
@@ -0,0 +1,38 @@
+"""quotes: full-text index (tsvector + GIN / FTS5) and keyset index
+
+Revision ID: 0012_quotes_fulltext
+Revises: 0011_quotes_chat_id_id
+Create Date: 2026-10-17
+"""
+from alembic import op
+from sqlalchemy import inspect
+
+from database.fulltext import install_fulltext, uninstall_fulltext
+
+# revision identifiers, used by Alembic.
+revision = '0012_quotes_fulltext'
+down_revision = '0011_quotes_chat_id_id'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    conn = op.get_bind()
+    inspector = inspect(conn)
+    indexes = [idx['name'] for idx in inspector.get_indexes('quotes')]
+
+    if 'ix_quotes_chat_id_created_at_id' not in indexes:
+        op.create_index(
+            'ix_quotes_chat_id_created_at_id',
+            'quotes',
+            ['chat_id', 'created_at', 'id'],
+            unique=False
+        )
+
+    # PostgreSQL: search_vector + GIN, SQLite: quotes_fts + триггеры
+    install_fulltext(conn)
+
+
+def downgrade() -> None:
+    uninstall_fulltext(op.get_bind())
+    op.drop_index('ix_quotes_chat_id_created_at_id', table_name='quotes')
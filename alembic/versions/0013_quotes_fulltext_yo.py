@@ -0,0 +1,27 @@
+"""quotes: full-text index folds ё into е
+
+Revision ID: 0013_quotes_fulltext_yo
+Revises: 0012_quotes_fulltext
+Create Date: 2026-10-18
+"""
+from alembic import op
+
+from database.fulltext import install_fulltext, uninstall_fulltext
+
+# revision identifiers, used by Alembic.
+revision = '0013_quotes_fulltext_yo'
+down_revision = '0012_quotes_fulltext'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    conn = op.get_bind()
+    # Генерируемую колонку и триггеры не изменить на месте — пересоздаём индекс целиком
+    uninstall_fulltext(conn)
+    install_fulltext(conn)
+
+
+def downgrade() -> None:
+    # Индекс с заменённой ё подходит и для 0012: запросы без ё находят то же, что раньше
+    pass
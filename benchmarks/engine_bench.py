@@ -0,0 +1,77 @@
+"""
+Бенчмарк настроек движка БД: echo и WAL-прагмы против новых значений по умолчанию.
+
+Запуск:
+    python benchmarks/engine_bench.py [кол-во операций]
+
+Использует временную SQLite базу; для PostgreSQL укажите BENCH_DB_URL.
+"""
+import asyncio
+import contextlib
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from sqlalchemy import select  # noqa: E402
+from sqlalchemy.ext.asyncio import AsyncSession  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+from config import settings  # noqa: E402
+from database.engine import build_engine  # noqa: E402
+from database.models import Base, User  # noqa: E402
+
+
+async def run_case(name: str, url: str, echo: bool, wal: bool, operations: int) -> None:
+    settings.SQLITE_WAL = wal
+    # echo=True вешает обработчик на текущий sys.stdout — подменяем его на
+    # /dev/null, чтобы мерить стоимость логирования, а не скорость терминала
+    devnull = open(os.devnull, 'w')
+    with contextlib.redirect_stdout(devnull):
+        engine = build_engine(url, echo=echo)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+    session_factory = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+    # Вставки: отдельный коммит на каждую, как при записи статистики в хендлерах
+    started = time.perf_counter()
+    for i in range(operations):
+        async with session_factory() as session:
+            session.add(User(full_name=f"Тестовый Пользователь {i}", department="ТП", telegram_username=f"user{i}"))
+            await session.commit()
+    writes = operations / (time.perf_counter() - started)
+
+    started = time.perf_counter()
+    for i in range(operations):
+        async with session_factory() as session:
+            await session.execute(select(User).where(User.telegram_username == f"user{i}"))
+    reads = operations / (time.perf_counter() - started)
+
+    await engine.dispose()
+    devnull.close()
+    print(f"{name:<28} запись: {writes:8.0f} оп/с   чтение: {reads:8.0f} оп/с")
+
+
+async def main() -> None:
+    operations = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    url = os.environ.get('BENCH_DB_URL')
+    tmp = None
+    if not url:
+        tmp = tempfile.TemporaryDirectory()
+        url = f"sqlite+aiosqlite:///{tmp.name}/bench.db"
+
+    print(f"{operations} операций, {url.split(':')[0]}")
+    await run_case("echo=True, без WAL (было)", url, echo=True, wal=False, operations=operations)
+    await run_case("echo=False, без WAL", url, echo=False, wal=False, operations=operations)
+    await run_case("echo=False, WAL (стало)", url, echo=False, wal=True, operations=operations)
+
+    if tmp:
+        tmp.cleanup()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,128 @@
+"""
+Бенчмарк маршрутизации !-команд: цепочка F.text.regexp против CommandTable.
+
+Запуск:
+    python benchmarks/router_bench.py [кол-во апдейтов]
+
+Через Dispatcher.feed_update прогоняются обычные сообщения чата (не команды):
+именно их раньше проверяли все регулярки подряд.
+"""
+import asyncio
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from aiogram import Bot, Dispatcher, F, Router  # noqa: E402
+from aiogram.types import Chat, Message, Update, User  # noqa: E402
+
+from handlers.command_table import CommandTable  # noqa: E402
+
+# Фильтры user_handlers и orgkom_handlers до перехода на CommandTable
+LEGACY_FILTERS = [
+    F.text.regexp(r'^!фамилия(?:\s+(.+))?', flags=0),
+    F.text.regexp(r"^!помощь\b", flags=0),
+    F.text.regexp(r"^!инфа\s+(.+)", flags=0),
+    F.reply_to_message & F.text.regexp(r"^!цитата\b", flags=0),
+    F.text.regexp(r"^!мудрость\b", flags=0),
+    F.text.regexp(r"^!рулетка\b", flags=0),
+    F.text.regexp(r"^!разбудить\s+(.+)$", flags=0),
+    F.text.regexp(r"^!орг\sдня\b|^!орг\sдня$", flags=0),
+    F.reply_to_message & F.text.regexp(r"^!нахуй\b", flags=0),
+    F.text.regexp(r"^!когда\b", flags=0),
+    F.text.regexp(r"^!вероятность(?:\s+.+)?$", flags=0),
+    F.text.regexp(r"^!пиво\b", flags=0),
+    F.text.regexp(r"^!статистика\s+пива\b|^!статистика\b", flags=0),
+    F.text.regexp(r"^!адрес\s+(.+)", flags=0),
+    F.reply_to_message & F.text.regexp(r"^!обосновать\b", flags=0),
+    F.text.regexp(r"^!кто\s+(.+)", flags=0),
+    F.text.regexp(r"^!перепарсить\b", flags=0),
+    F.reply_to_message & F.text.regexp(r"^!дуель\b", flags=0),
+    F.reply_to_message & F.text.regexp(r"^!матдуэль\b", flags=0),
+    F.text.regexp(r"^!анмут\b", flags=0),
+    F.text.regexp(r"^!пиздануть\b", flags=0),
+    F.text.regexp(r"^!вокабулар\b", flags=0),
+]
+
+COMMANDS = [
+    ("фамилия", (), None), ("помощь", (), None), ("инфа", (), r"^!инфа\s+(.+)"),
+    ("цитата", (F.reply_to_message,), None), ("мудрость", (), None), ("рулетка", (), None),
+    ("разбудить", (), r"^!разбудить\s+(.+)$"), ("орг", (), r"^!орг\sдня\b"),
+    ("нахуй", (F.reply_to_message,), None), ("когда", (), None),
+    ("вероятность", (), r"^!вероятность(?:\s+.+)?$"), ("пиво", (), None), ("статистика", (), None),
+    ("адрес", (), r"^!адрес\s+(.+)"), ("обосновать", (F.reply_to_message,), None),
+    ("кто", (), r"^!кто\s+(.+)"), ("перепарсить", (), None), ("дуель", (F.reply_to_message,), None),
+    ("матдуэль", (F.reply_to_message,), None), ("анмут", (), None), ("пиздануть", (), None),
+    ("вокабулар", (), None),
+]
+
+TEXTS = [
+    "всем привет, во сколько сбор?",
+    "ахахах",
+    "скиньте пожалуйста расписание на завтра",
+    "ок",
+    "кто-нибудь видел мою кружку 😭",
+]
+
+
+async def handler(message: Message) -> None:
+    pass
+
+
+def legacy_dispatcher() -> Dispatcher:
+    router = Router()
+    for flt in LEGACY_FILTERS:
+        router.message.register(handler, flt)
+    dp = Dispatcher()
+    dp.include_router(router)
+    return dp
+
+
+def table_dispatcher() -> Dispatcher:
+    router = Router()
+    table = CommandTable()
+    table.attach(router)
+    for name, filters, pattern in COMMANDS:
+        table.command(name, *filters, pattern=pattern)(handler)
+    dp = Dispatcher()
+    dp.include_router(router)
+    return dp
+
+
+def make_updates(count: int) -> list[Update]:
+    chat = Chat(id=-100, type="supergroup")
+    user = User(id=1, is_bot=False, first_name="Тест")
+    return [
+        Update(update_id=i, message=Message(
+            message_id=i, date=datetime.now(), chat=chat, from_user=user, text=TEXTS[i % len(TEXTS)]
+        ))
+        for i in range(count)
+    ]
+
+
+async def measure(name: str, dp: Dispatcher, bot: Bot, updates: list[Update]) -> None:
+    for update in updates[:100]:  # прогрев
+        await dp.feed_update(bot, update)
+    started = time.perf_counter()
+    for update in updates:
+        await dp.feed_update(bot, update)
+    rate = len(updates) / (time.perf_counter() - started)
+    print(f"{name:<22} {rate:10.0f} апдейтов/с")
+
+
+async def main() -> None:
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    bot = Bot("123456:ABCDEFabcdefABCDEFabcdefABCDEFabcdef")
+    updates = make_updates(count)
+    print(f"{count} обычных сообщений (не команд)")
+    try:
+        await measure("F.text.regexp (было)", legacy_dispatcher(), bot, updates)
+        await measure("CommandTable (стало)", table_dispatcher(), bot, updates)
+    finally:
+        await bot.session.close()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
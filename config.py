@@ -15,8 +15,92 @@ class Settings(BaseSettings):
     POSTGRES_HOST: str = Field(default='db', env='POSTGRES_HOST')
     POSTGRES_PORT: int = Field(default=5432, env='POSTGRES_PORT')
     
+    # Параметры движка БД
+    DB_ECHO: bool = Field(default=False, env='DB_ECHO')  # логировать каждый SQL-запрос
+    DB_POOL_SIZE: int = Field(default=5, env='DB_POOL_SIZE')
+    DB_MAX_OVERFLOW: int = Field(default=10, env='DB_MAX_OVERFLOW')
+    DB_POOL_PRE_PING: bool = Field(default=True, env='DB_POOL_PRE_PING')
+    DB_POOL_RECYCLE: int = Field(default=1800, env='DB_POOL_RECYCLE')  # сек, -1 — не пересоздавать
+    DB_POOL_TIMEOUT: float = Field(default=30, env='DB_POOL_TIMEOUT')
+    # asyncpg: размер кэша подготовленных запросов (0 — выключить, нужно за pgbouncer)
+    DB_STATEMENT_CACHE_SIZE: int = Field(default=100, env='DB_STATEMENT_CACHE_SIZE')
+    # PostgreSQL statement_timeout в миллисекундах (0 — без ограничения)
+    DB_STATEMENT_TIMEOUT_MS: int = Field(default=15000, env='DB_STATEMENT_TIMEOUT_MS')
+    # SQLite: журнал WAL и synchronous=NORMAL вместо FULL
+    SQLITE_WAL: bool = Field(default=True, env='SQLITE_WAL')
+    SQLITE_BUSY_TIMEOUT_MS: int = Field(default=5000, env='SQLITE_BUSY_TIMEOUT_MS')
+    
     ADMIN_IDS: list[int] = Field(default_factory=list, env='ADMIN_IDS')
     
+    # Режим получения апдейтов: 'polling' или 'webhook'
+    BOT_MODE: str = Field(default='polling', env='BOT_MODE')
+    
+    # Настройки webhook (используются при BOT_MODE=webhook)
+    WEBHOOK_BASE_URL: str = Field(default='', env='WEBHOOK_BASE_URL')  # https://bot.example.com
+    WEBHOOK_PATH: str = Field(default='/webhook', env='WEBHOOK_PATH')
+    WEBHOOK_SECRET: str = Field(default='', env='WEBHOOK_SECRET')
+    WEBHOOK_HEALTH_PATH: str = Field(default='/health', env='WEBHOOK_HEALTH_PATH')
+    WEBAPP_HOST: str = Field(default='0.0.0.0', env='WEBAPP_HOST')
+    WEBAPP_PORT: int = Field(default=8080, env='WEBAPP_PORT')
+    # Количество процессов-воркеров на одном порту (SO_REUSEPORT)
+    WEBHOOK_WORKERS: int = Field(default=1, env='WEBHOOK_WORKERS')
+    # Как часто воркер сверяет тип чата с базой, если воркеров несколько (сек)
+    CHAT_REGISTRY_REFRESH: int = Field(default=30, env='CHAT_REGISTRY_REFRESH')
+    
+    # Сколько побудок отправляется одновременно
+    WAKEUP_CONCURRENCY: int = Field(default=10, env='WAKEUP_CONCURRENCY')
+    
+    # Лимиты исходящих сообщений (лимиты Telegram: ~30/с всего, 1/с в личку, 20/мин в группу)
+    OUTBOUND_GLOBAL_RATE: float = Field(default=25, env='OUTBOUND_GLOBAL_RATE')
+    OUTBOUND_PRIVATE_RATE: float = Field(default=1, env='OUTBOUND_PRIVATE_RATE')
+    OUTBOUND_GROUP_RATE_PER_MINUTE: float = Field(default=20, env='OUTBOUND_GROUP_RATE_PER_MINUTE')
+    OUTBOUND_CHAT_BURST: int = Field(default=3, env='OUTBOUND_CHAT_BURST')
+    OUTBOUND_MAX_RETRIES: int = Field(default=3, env='OUTBOUND_MAX_RETRIES')
+    
+    # Параллелизм массовых операций модерации (!анмут)
+    MODERATION_CONCURRENCY: int = Field(default=8, env='MODERATION_CONCURRENCY')
+    
+    # Рендер карточек !мудрость: 'process' или 'thread' пул, очередь и таймаут (сек)
+    RENDER_EXECUTOR: str = Field(default='process', env='RENDER_EXECUTOR')
+    RENDER_WORKERS: int = Field(default=2, env='RENDER_WORKERS')
+    RENDER_QUEUE_SIZE: int = Field(default=8, env='RENDER_QUEUE_SIZE')
+    RENDER_TIMEOUT: float = Field(default=5, env='RENDER_TIMEOUT')
+    
+    # Отложенная запись !пиво и !цитата: сброс раз в N мс или при M событиях
+    WRITE_BEHIND_INTERVAL_MS: int = Field(default=500, env='WRITE_BEHIND_INTERVAL_MS')
+    WRITE_BEHIND_MAX_EVENTS: int = Field(default=200, env='WRITE_BEHIND_MAX_EVENTS')
+    
+    # Сколько мест показывать в !статистика
+    BEER_TOP_SIZE: int = Field(default=10, env='BEER_TOP_SIZE')
+    
+    # !орг дня: один организатор на чат и дату вместо случайного на каждый вызов
+    ORG_OF_DAY_DETERMINISTIC: bool = Field(default=False, env='ORG_OF_DAY_DETERMINISTIC')
+    
+    # Время на ответ в !матдуэль (сек) и период фоновой очистки просроченных дуэлей
+    MATH_DUEL_TIMEOUT: int = Field(default=300, env='MATH_DUEL_TIMEOUT')
+    MATH_DUEL_SWEEP_INTERVAL: float = Field(default=60, env='MATH_DUEL_SWEEP_INTERVAL')
+    
+    # Выбор цитаты для !мудрость: >1 — чаще свежие; не повторять последние N показанных
+    QUOTE_RECENCY_WEIGHT: float = Field(default=1.0, env='QUOTE_RECENCY_WEIGHT')
+    QUOTE_NO_REPEAT: int = Field(default=0, env='QUOTE_NO_REPEAT')
+    # Сколько цитат на странице !цитаты
+    QUOTE_SEARCH_PAGE_SIZE: int = Field(default=5, env='QUOTE_SEARCH_PAGE_SIZE')
+    
+    # Кэш «telegram id → организатор и его права» для проверок вроде ТП в !пиво
+    IDENTITY_CACHE_SIZE: int = Field(default=4096, env='IDENTITY_CACHE_SIZE')
+    IDENTITY_CACHE_TTL: int = Field(default=600, env='IDENTITY_CACHE_TTL')
+    
+    # HTTP-эндпоинт /metrics для Prometheus (при нескольких воркерах порт = METRICS_PORT + номер воркера)
+    METRICS_ENABLED: bool = Field(default=True, env='METRICS_ENABLED')
+    METRICS_HOST: str = Field(default='0.0.0.0', env='METRICS_HOST')
+    METRICS_PORT: int = Field(default=9100, env='METRICS_PORT')
+    
+    # Автоперезагрузка организаторов при изменении Excel файла
+    USER_DATA_FILE: str = Field(default='user_data.xlsx', env='USER_DATA_FILE')
+    USER_DATA_WATCH: bool = Field(default=True, env='USER_DATA_WATCH')
+    USER_DATA_WATCH_INTERVAL: float = Field(default=5, env='USER_DATA_WATCH_INTERVAL')
+    USER_DATA_DEBOUNCE: float = Field(default=2, env='USER_DATA_DEBOUNCE')
+    
     class Config:
         env_file = '.env'
         env_file_encoding = 'utf-8'
@@ -25,6 +109,21 @@ class Settings(BaseSettings):
     def postgres_url(self) -> str:
         """Формирует URL для PostgreSQL"""
         return f"postgresql+asyncpg://{self.POSTGRES_USER}:{self.POSTGRES_PASSWORD}@{self.POSTGRES_HOST}:{self.POSTGRES_PORT}/{self.POSTGRES_DB}"
+    
+    @property
+    def single_process(self) -> bool:
+        """
+        Все апдейты обрабатывает один процесс (polling или WEBHOOK_WORKERS=1).
+        Только тогда кэши в памяти видят все изменения; при нескольких
+        webhook-воркерах апдейты чата попадают в разные процессы, и сервисы
+        читают то же самое из базы.
+        """
+        return self.BOT_MODE != 'webhook' or self.WEBHOOK_WORKERS <= 1
+
+    @property
+    def webhook_url(self) -> str:
+        """Полный URL webhook, который регистрируется в Telegram"""
+        return f"{self.WEBHOOK_BASE_URL.rstrip('/')}{self.WEBHOOK_PATH}"
 
 
 settings = Settings()
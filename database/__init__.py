@@ -4,6 +4,8 @@
 
 from .models import Base, User, Chat
 from .engine import engine, AsyncSessionLocal, get_session
+# Регистрирует создание полнотекстового индекса цитат вместе с таблицей
+from . import fulltext
 
 __all__ = ['Base', 'User', 'Chat', 'engine', 'AsyncSessionLocal', 'get_session']
 
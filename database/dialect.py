@@ -0,0 +1,15 @@
+"""
+Диалектно-зависимые конструкции SQL (PostgreSQL / SQLite)
+"""
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+def dialect_insert(session: AsyncSession, model):
+    """
+    INSERT с поддержкой ON CONFLICT для текущей базы.
+    У PostgreSQL и SQLite одинаковый API on_conflict_do_update / on_conflict_do_nothing.
+    """
+    if session.bind.dialect.name == 'postgresql':
+        return postgresql.insert(model)
+    return sqlite.insert(model)
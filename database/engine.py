@@ -1,4 +1,7 @@
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+from typing import Any, Callable
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, AsyncEngine
 from sqlalchemy.orm import sessionmaker
 from config import settings
 
@@ -15,9 +18,65 @@ else:
     # Если DB_URL явно указан и это не SQLite - используем его
     db_url = settings.DB_URL
 
-engine = create_async_engine(db_url, echo=True)
+
+def _sqlite_pragmas(dbapi_connection, connection_record):
+    """Настройка каждого нового соединения SQLite"""
+    cursor = dbapi_connection.cursor()
+    if settings.SQLITE_WAL:
+        # WAL: читатели не блокируют писателя, fsync только на checkpoint
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute(f"PRAGMA busy_timeout={int(settings.SQLITE_BUSY_TIMEOUT_MS)}")
+    cursor.close()
+
+
+def build_engine(url: str, echo: bool | None = None) -> AsyncEngine:
+    """Создаёт движок с настройками пула и драйвера из Settings"""
+    options = {'echo': settings.DB_ECHO if echo is None else echo}
+
+    if url.startswith('sqlite'):
+        new_engine = create_async_engine(url, **options)
+        event.listen(new_engine.sync_engine, 'connect', _sqlite_pragmas)
+        return new_engine
+
+    options.update(
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_pre_ping=settings.DB_POOL_PRE_PING,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+    )
+    if '+asyncpg' in url:
+        server_settings = {'application_name': 'vshu_bot'}
+        if settings.DB_STATEMENT_TIMEOUT_MS:
+            server_settings['statement_timeout'] = str(settings.DB_STATEMENT_TIMEOUT_MS)
+        options['connect_args'] = {
+            'statement_cache_size': settings.DB_STATEMENT_CACHE_SIZE,
+            'server_settings': server_settings,
+        }
+    return create_async_engine(url, **options)
+
+
+engine = build_engine(db_url)
 AsyncSessionLocal = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
 
+_AFTER_COMMIT = "after_commit"
+
+
+def after_commit(session: AsyncSession, callback: Callable[[], Any]) -> None:
+    """
+    Откладывает callback до успешного коммита сессии апдейта — например, чтобы
+    положить новую запись в память только когда она уже видна другим сессиям.
+    При откате callback не вызывается.
+    """
+    session.info.setdefault(_AFTER_COMMIT, []).append(callback)
+
+
+def run_after_commit(session: AsyncSession) -> None:
+    """Вызывает callback'и after_commit; вызывать сразу после session.commit()"""
+    for callback in session.info.pop(_AFTER_COMMIT, ()):
+        callback()
+
 async def get_session():
     async with AsyncSessionLocal() as session:
-        yield session
\ No newline at end of file
+        yield session
@@ -0,0 +1,119 @@
+"""
+Полнотекстовый индекс цитат.
+
+PostgreSQL: генерируемая колонка quotes.search_vector (tsvector с русским
+стеммингом) и GIN-индекс по ней. SQLite: внешняя FTS5-таблица quotes_fts,
+которую синхронизируют триггеры. Колонка и таблица не входят в модель —
+их создаёт install_fulltext: при create_all (событие after_create) и в миграции.
+
+Ни русский стеммер, ни токенайзер unicode61 не считают «ё» и «е» одной буквой,
+поэтому ё заменяется на е и в индексируемом тексте, и в запросе.
+"""
+import re
+
+from sqlalchemy import event, literal_column, select, table, text
+from sqlalchemy.engine import Connection
+
+from database.models import Quote
+
+
+def _fold_sql(expr: str) -> str:
+    """SQL-выражение: expr с ё, заменённой на е (replace есть и в PostgreSQL, и в SQLite)"""
+    return f"replace(replace({expr}, 'ё', 'е'), 'Ё', 'Е')"
+
+
+def _fold(value: str) -> str:
+    return value.replace('ё', 'е').replace('Ё', 'Е')
+
+
+_QUOTE_DOCUMENT = "coalesce(text, '') || ' ' || coalesce(author_name, '')"
+
+_POSTGRES_DDL = [
+    "ALTER TABLE quotes ADD COLUMN IF NOT EXISTS search_vector tsvector "
+    f"GENERATED ALWAYS AS (to_tsvector('russian', {_fold_sql(_QUOTE_DOCUMENT)})) STORED",
+    "CREATE INDEX IF NOT EXISTS ix_quotes_search_vector ON quotes USING gin (search_vector)",
+]
+
+# Внешняя FTS5-таблица: в индекс попадает текст с заменённой ё, поэтому 'rebuild'
+# (он перечитал бы исходный текст) не годится — заполняем индекс сами, и 'delete'
+# получает те же заменённые значения, что были проиндексированы
+_NEW_ROW = f"new.id, {_fold_sql('new.text')}, {_fold_sql('new.author_name')}"
+_OLD_ROW = f"old.id, {_fold_sql('old.text')}, {_fold_sql('old.author_name')}"
+
+_SQLITE_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS quotes_fts USING fts5("
+    "text, author_name, content='quotes', content_rowid='id', tokenize='unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER IF NOT EXISTS quotes_fts_ai AFTER INSERT ON quotes BEGIN "
+    f"INSERT INTO quotes_fts(rowid, text, author_name) VALUES ({_NEW_ROW}); END",
+    "CREATE TRIGGER IF NOT EXISTS quotes_fts_ad AFTER DELETE ON quotes BEGIN "
+    f"INSERT INTO quotes_fts(quotes_fts, rowid, text, author_name) VALUES ('delete', {_OLD_ROW}); END",
+    "CREATE TRIGGER IF NOT EXISTS quotes_fts_au AFTER UPDATE OF text, author_name ON quotes BEGIN "
+    f"INSERT INTO quotes_fts(quotes_fts, rowid, text, author_name) VALUES ('delete', {_OLD_ROW}); "
+    f"INSERT INTO quotes_fts(rowid, text, author_name) VALUES ({_NEW_ROW}); END",
+    # Индексируем цитаты, сохранённые до появления FTS
+    "INSERT INTO quotes_fts(quotes_fts) VALUES ('delete-all')",
+    "INSERT INTO quotes_fts(rowid, text, author_name) "
+    f"SELECT id, {_fold_sql('text')}, {_fold_sql('author_name')} FROM quotes",
+]
+
+
+def install_fulltext(conn: Connection) -> None:
+    """Создаёт полнотекстовый индекс цитат для текущей базы (идемпотентно)"""
+    if conn.dialect.name == 'postgresql':
+        statements = _POSTGRES_DDL
+    elif conn.dialect.name == 'sqlite':
+        statements = _SQLITE_DDL
+    else:
+        return
+    for statement in statements:
+        conn.execute(text(statement))
+
+
+def uninstall_fulltext(conn: Connection) -> None:
+    if conn.dialect.name == 'postgresql':
+        conn.execute(text("DROP INDEX IF EXISTS ix_quotes_search_vector"))
+        conn.execute(text("ALTER TABLE quotes DROP COLUMN IF EXISTS search_vector"))
+    elif conn.dialect.name == 'sqlite':
+        for trigger in ('quotes_fts_ai', 'quotes_fts_ad', 'quotes_fts_au'):
+            conn.execute(text(f"DROP TRIGGER IF EXISTS {trigger}"))
+        conn.execute(text("DROP TABLE IF EXISTS quotes_fts"))
+
+
+@event.listens_for(Quote.__table__, 'after_create')
+def _after_quotes_created(target, connection, **kw):
+    install_fulltext(connection)
+
+
+def _fts5_query(query: str) -> str | None:
+    # Каждое слово — отдельный префиксный терм. Морфологии у FTS5 нет: «пиво»
+    # найдёт «пиво» и «пивом», но не «пива» — для этого нужно набрать «пив»
+    words = re.findall(r"\w+", _fold(query))
+    if not words:
+        return None
+    return " ".join(f'"{word}"*' for word in words)
+
+
+def quote_match(dialect_name: str, query: str):
+    """
+    Условие WHERE «цитата подходит под запрос» для текущей базы.
+    None — в запросе нет слов, искать нечего.
+    """
+    if dialect_name == 'postgresql':
+        return literal_column('quotes.search_vector').op('@@')(
+            text("plainto_tsquery('russian', :fts_query)").bindparams(fts_query=_fold(query))
+        )
+
+    fts_query = _fts5_query(query)
+    if fts_query is None:
+        return None
+    if dialect_name == 'sqlite':
+        matched = (
+            select(literal_column('rowid'))
+            .select_from(table('quotes_fts'))
+            .where(text("quotes_fts MATCH :fts_query").bindparams(fts_query=fts_query))
+        )
+        return Quote.id.in_(matched)
+
+    # Прочие базы — без индекса
+    words = re.findall(r"\w+", query)
+    return Quote.text.ilike(f"%{' '.join(words)}%")
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, BigInteger, DateTime, Text, Boolean
+from sqlalchemy import Column, Integer, String, BigInteger, DateTime, Text, Boolean, Float, Index
 from sqlalchemy.ext.declarative import declarative_base
 from datetime import datetime
 
@@ -26,7 +26,7 @@ class User(Base):
     id = Column(Integer, primary_key=True)
     
     # Обязательные поля
-    full_name = Column(String(255), nullable=False, index=True)  # ФИО
+    full_name = Column(String(255), nullable=False, index=True, unique=True)  # ФИО
     department = Column(String(255), nullable=False)  # Подразделение
     
     # Необязательные поля
@@ -42,6 +42,7 @@ class User(Base):
     address = Column(Text, nullable=True)  # Адрес проживания (для технической поддержки)
     
     # Служебные поля
+    row_hash = Column(String(64), nullable=True)  # sha256 строки Excel, из которой загружена запись
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
@@ -52,22 +53,35 @@ class User(Base):
 class Quote(Base):
     """Цитаты из переписки"""
     __tablename__ = 'quotes'
+    __table_args__ = (
+        # id цитат чата по порядку: список для !мудрость и OFFSET-выбор
+        Index('ix_quotes_chat_id_id', 'chat_id', 'id'),
+        # Лента !цитаты: keyset-пагинация по (created_at, id) внутри чата
+        Index('ix_quotes_chat_id_created_at_id', 'chat_id', 'created_at', 'id'),
+    )
 
     id = Column(Integer, primary_key=True)
-    chat_id = Column(BigInteger, index=True, nullable=False)
+    chat_id = Column(BigInteger, nullable=False)
     author_user_id = Column(BigInteger, index=True, nullable=False)  # чей текст процитировали
     author_name = Column(String(255), nullable=True)  # сохраняем name на момент цитирования
     quoter_user_id = Column(BigInteger, index=True, nullable=False)  # кто процитировал
     text = Column(Text, nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow, index=True)
+    card_file_id = Column(String(255), nullable=True)  # file_id карточки !мудрость в Telegram
 
 
 class BeerStat(Base):
     """Статистика налитого пива по пользователям в рамках чата"""
     __tablename__ = 'beer_stats'
+    __table_args__ = (
+        # Одна строка на пользователя в чате — цель ON CONFLICT при наливании
+        Index('ix_beer_stats_chat_id_user_id', 'chat_id', 'user_id', unique=True),
+        # Топ чата: WHERE chat_id = ? ORDER BY count DESC LIMIT N
+        Index('ix_beer_stats_chat_id_count', 'chat_id', 'count'),
+    )
 
     id = Column(Integer, primary_key=True)
-    chat_id = Column(BigInteger, index=True, nullable=False)
+    chat_id = Column(BigInteger, nullable=False)
     user_id = Column(BigInteger, index=True, nullable=False)
     username = Column(String(255), nullable=True)  # последняя известная метка
     count = Column(Integer, default=0, nullable=False)
@@ -89,9 +103,13 @@ class Wakeup(Base):
 class MathDuel(Base):
     """Активные математические дуэли"""
     __tablename__ = 'math_duels'
+    __table_args__ = (
+        # Активные дуэли чата: WHERE chat_id = ? AND expired = false AND created_at > ?
+        Index('ix_math_duels_chat_id_expired_created_at', 'chat_id', 'expired', 'created_at'),
+    )
 
     id = Column(Integer, primary_key=True)
-    chat_id = Column(BigInteger, index=True, nullable=False)
+    chat_id = Column(BigInteger, nullable=False)
     user1_id = Column(BigInteger, index=True, nullable=False)  # Тот, кто вызвал на дуэль
     user2_id = Column(BigInteger, index=True, nullable=False)  # Тот, на кого ответили
     num1 = Column(Integer, nullable=False)
@@ -100,3 +118,30 @@ class MathDuel(Base):
     winner_id = Column(BigInteger, nullable=True)  # Кто выиграл
     created_at = Column(DateTime, default=datetime.utcnow, index=True)
     expired = Column(Boolean, default=False, index=True)
+
+
+class Mute(Base):
+    """Муты, выданные ботом (рулетка, дуэли)"""
+    __tablename__ = 'mutes'
+    __table_args__ = (
+        # «кто в муте в этом чате прямо сейчас»: WHERE chat_id = ? AND until > now
+        Index('ix_mutes_chat_id_until', 'chat_id', 'until'),
+    )
+
+    id = Column(Integer, primary_key=True)
+    chat_id = Column(BigInteger, nullable=False)
+    user_id = Column(BigInteger, index=True, nullable=False)
+    until = Column(DateTime, nullable=False)  # до какого момента действует мут (UTC)
+    reason = Column(String(50), nullable=True)  # 'roulette', 'duel', 'math_duel'
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class ImportState(Base):
+    """Отпечаток последнего импортированного Excel файла"""
+    __tablename__ = 'import_state'
+
+    id = Column(Integer, primary_key=True)
+    source = Column(String(512), unique=True, nullable=False)  # абсолютный путь к файлу
+    mtime = Column(Float, nullable=False)
+    digest = Column(String(64), nullable=False)  # sha256 содержимого
+    imported_at = Column(DateTime, default=datetime.utcnow)
@@ -4,8 +4,9 @@ from aiogram.filters import ChatMemberUpdatedFilter, MEMBER, ADMINISTRATOR, Comm
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from database.engine import after_commit
 from database.models import Chat
-from database.engine import AsyncSessionLocal
+from services.chat_registry import chat_registry
 
 router = Router()
 
@@ -19,13 +20,7 @@ async def bot_added_to_chat(event: ChatMemberUpdated):
     # Проверяем, что бот был добавлен (а не удален)
     if event.new_chat_member.status in ['member', 'administrator']:
         # Проверяем, не зарегистрирован ли уже этот чат
-        async with AsyncSessionLocal() as session:
-            result = await session.execute(
-                select(Chat).where(Chat.chat_id == event.chat.id)
-            )
-            existing_chat = result.scalar_one_or_none()
-        
-        if existing_chat:
+        if await chat_registry.get(event.chat.id):
             return  # Чат уже зарегистрирован
         
         # Создаем клавиатуру с выбором типа чата
@@ -52,7 +47,7 @@ async def bot_added_to_chat(event: ChatMemberUpdated):
 
 
 @router.callback_query(F.data.startswith("chat_type:"))
-async def process_chat_type_selection(callback: CallbackQuery):
+async def process_chat_type_selection(callback: CallbackQuery, session: AsyncSession):
     """
     Обработчик выбора типа чата.
     Сохраняет тип чата в базе данных.
@@ -71,27 +66,28 @@ async def process_chat_type_selection(callback: CallbackQuery):
         return
     
     # Сохраняем в базе данных
-    async with AsyncSessionLocal() as session:
-        # Проверяем, есть ли уже запись
-        result = await session.execute(
-            select(Chat).where(Chat.chat_id == chat_id)
+    # Проверяем, есть ли уже запись
+    result = await session.execute(
+        select(Chat).where(Chat.chat_id == chat_id)
+    )
+    existing_chat = result.scalar_one_or_none()
+    
+    if existing_chat:
+        # Обновляем тип
+        existing_chat.chat_type = chat_type
+        saved_chat = existing_chat
+    else:
+        # Создаем новую запись
+        chat = await callback.bot.get_chat(chat_id)
+        saved_chat = Chat(
+            chat_id=chat_id,
+            chat_type=chat_type,
+            chat_title=chat.title
         )
-        existing_chat = result.scalar_one_or_none()
-        
-        if existing_chat:
-            # Обновляем тип
-            existing_chat.chat_type = chat_type
-        else:
-            # Создаем новую запись
-            chat = await callback.bot.get_chat(chat_id)
-            new_chat = Chat(
-                chat_id=chat_id,
-                chat_type=chat_type,
-                chat_title=chat.title
-            )
-            session.add(new_chat)
-        
-        await session.commit()
+        session.add(saved_chat)
+    
+    # Реестр чатов в памяти обновляем, когда запись уже в базе
+    after_commit(session, lambda: chat_registry.remember(saved_chat))
     
     # Формируем сообщение в зависимости от типа
     if chat_type == 'organizers':
@@ -130,11 +126,7 @@ async def show_chat_info(message: Message):
         return
     
     # Получаем информацию о чате
-    async with AsyncSessionLocal() as session:
-        result = await session.execute(
-            select(Chat).where(Chat.chat_id == message.chat.id)
-        )
-        chat = result.scalar_one_or_none()
+    chat = await chat_registry.get(message.chat.id)
     
     if not chat:
         await message.answer(
@@ -0,0 +1,74 @@
+"""
+Таблица !-команд роутера.
+
+Вместо двух десятков F.text.regexp, которые aiogram проверяет по очереди для
+каждого сообщения, на роутере висит один фильтр: он отсекает текст без «!» по
+первому символу, берёт первое слово и находит хендлер в словаре. Регулярка
+команды (если нужна) компилируется один раз и проверяется только для неё.
+"""
+import re
+from dataclasses import dataclass, field
+
+from aiogram import Router
+from aiogram.dispatcher.event.handler import CallableObject
+from aiogram.types import Message
+from magic_filter import MagicFilter
+
+# Имя команды: слово сразу после «!». \w+ жадный, поэтому совпадение
+# эквивалентно ^!команда\b из прежних регулярок
+_TOKEN = re.compile(r"!(\w+)")
+
+
+@dataclass
+class CommandEntry:
+    name: str
+    callback: CallableObject
+    pattern: re.Pattern | None = None  # проверка всего текста, если аргументы важны
+    filters: tuple[MagicFilter, ...] = field(default_factory=tuple)
+
+    def check(self, message: Message) -> bool:
+        if self.pattern is not None and self.pattern.match(message.text) is None:
+            return False
+        return all(f.resolve(message) for f in self.filters)
+
+
+class CommandTable:
+    """Словарь «команда → хендлеры» с одним фильтром aiogram на весь роутер"""
+
+    def __init__(self):
+        self._commands: dict[str, list[CommandEntry]] = {}
+
+    def attach(self, router: Router) -> None:
+        """Регистрирует в роутере единственный хендлер-диспетчер"""
+        router.message.register(self._dispatch, self)
+
+    def command(self, name: str, *filters: MagicFilter, pattern: str | None = None):
+        """
+        Декоратор: хендлер для «!name». pattern — регулярка по всему тексту
+        (для обязательных аргументов), filters — дополнительные magic-фильтры,
+        например F.reply_to_message.
+        """
+        compiled = re.compile(pattern) if pattern else None
+
+        def decorator(callback):
+            entry = CommandEntry(name, CallableObject(callback), compiled, filters)
+            self._commands.setdefault(name, []).append(entry)
+            return callback
+
+        return decorator
+
+    def __call__(self, message: Message) -> bool | dict:
+        text = message.text
+        if not text or text[0] != "!":
+            return False
+        token = _TOKEN.match(text)
+        if token is None:
+            return False
+        for entry in self._commands.get(token.group(1), ()):
+            if entry.check(message):
+                return {"command_entry": entry}
+        return False
+
+    @staticmethod
+    async def _dispatch(message: Message, command_entry: CommandEntry, **data):
+        return await command_entry.callback.call(message, **data)
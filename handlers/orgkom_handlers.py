@@ -1,31 +1,19 @@
-from aiogram import Router, F
+from aiogram import Router
 from aiogram.types import Message
 from aiogram.filters import Command
-from sqlalchemy import select
-from sqlalchemy.ext.asyncio import AsyncSession
 
-from database.models import User, Chat
-from database.engine import AsyncSessionLocal
+from database.models import User
+from handlers.command_table import CommandTable
+from services.directory import directory
 
 router = Router()
-
-
-async def is_orgkom_chat(chat_id: int) -> bool:
-    """Проверяет, является ли чат чатом организаторов"""
-    async with AsyncSessionLocal() as session:
-        result = await session.execute(
-            select(Chat).where(
-                Chat.chat_id == chat_id,
-                Chat.chat_type == 'organizers'
-            )
-        )
-        chat = result.scalar_one_or_none()
-        return chat is not None
+commands = CommandTable()
+commands.attach(router)
 
 
 @router.message(Command("фамилия"))
-@router.message(F.text.regexp(r'^!фамилия(?:\s+(.+))?', flags=0))
-async def search_by_surname(message: Message):
+@commands.command("фамилия")
+async def search_by_surname(message: Message, chat_type: str | None = None):
     """
     Обработчик команды !фамилия для поиска организаторов по фамилии
     Использование: !фамилия Иванов
@@ -35,7 +23,7 @@ async def search_by_surname(message: Message):
         await message.answer("❌ Эта команда доступна только в групповых чатах организаторов!")
         return
     
-    if not await is_orgkom_chat(message.chat.id):
+    if chat_type != 'organizers':
         return  # Игнорируем команду в чатах не-организаторов
     
     # Извлекаем фамилию из команды
@@ -57,15 +45,8 @@ async def search_by_surname(message: Message):
         )
         return
     
-    # Поиск в базе данных
-    async with AsyncSessionLocal() as session:
-        # Ищем по началу ФИО (регистронезависимо)
-        result = await session.execute(
-            select(User).where(
-                User.full_name.ilike(f'%{surname}%')
-            )
-        )
-        users = result.scalars().all()
+    # Поиск по справочнику в памяти
+    users = directory.search(surname)
     
     if not users:
         await message.answer(
@@ -1,25 +1,44 @@
 from aiogram import Router, F
-from aiogram.types import Message, ChatPermissions
+from aiogram.types import Message, CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton
+from aiogram.exceptions import TelegramBadRequest
 from aiogram.filters import Command
 from aiogram.utils.markdown import hbold
 from sqlalchemy import select, update, or_, and_
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime, timedelta
 import random
-from io import BytesIO
 
-from database.engine import AsyncSessionLocal
-from database.models import User, Quote, BeerStat, Wakeup, MathDuel
+from config import settings
+from database.engine import after_commit
+from database.models import User, Wakeup, MathDuel
+from handlers.command_table import CommandTable
+from services.directory import directory
+from services.identity import identity_resolver
+from services.leaderboard import beer_leaderboard
+from services.math_duels import math_duels
+from services.moderation import mute_user, unmute_tracked
+from services.organizers import org_of_day, random_organizer
+from services.outbound import Priority, outbound
+from services.quote_cards import quote_cards
+from services.quote_picker import quote_picker
+from services.quote_search import Cursor, QuoteSearch, quote_searcher
+from services.wakeups import wakeup_scheduler
+from services.write_behind import write_behind
 from utils import load_users_from_excel
 from pathlib import Path
 
 router = Router()
 
+# !-команды разбираются одной таблицей вместо регулярки на каждый хендлер
+commands = CommandTable()
+commands.attach(router)
+
 
 def html_escape(s: str) -> str:
     return (s or "").replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
 
 
-@router.message(F.text.regexp(r"^!помощь\b", flags=0))
+@commands.command("помощь")
 @router.message(Command("help"))
 async def cmd_help(message: Message):
     text = (
@@ -27,6 +46,7 @@ async def cmd_help(message: Message):
         "• !инфа [фамилия/юзернейм] — инфо об организаторе\n"
         "• !цитата (в ответ) — сохранить цитату\n"
         "• !мудрость — случайная цитата (картинка)\n"
+        "• !цитаты [слова] — поиск по цитатам (в ответ — цитаты автора)\n"
         "• !рулетка — шанс 1/6 получить мут на 10 мин\n"
         "• !разбудить DD.MM.YYYY HH:MM — напоминание в чате\n"
         "• !орг дня — случайный организатор дня\n"
@@ -47,24 +67,16 @@ async def cmd_help(message: Message):
     await message.answer(text, parse_mode=None)
 
 
-@router.message(F.text.regexp(r"^!инфа\s+(.+)", flags=0))
+@commands.command("инфа", pattern=r"^!инфа\s+(.+)")
 async def cmd_info(message: Message):
     query = (message.text or "").split(maxsplit=1)[1].strip()
     
     # Убираем @ если есть
     search_query = query.lstrip('@')
     
-    async with AsyncSessionLocal() as session:
-        # Ищем и по фамилии, и по telegram_username
-        result = await session.execute(
-            select(User).where(
-                or_(
-                    User.full_name.ilike(f"%{search_query}%"),
-                    User.telegram_username.ilike(f"%{search_query}%")
-                )
-            )
-        )
-        users = result.scalars().all()
+    # @username — сначала точное совпадение, иначе ищем и по фамилии, и по telegram_username
+    exact = directory.by_username(search_query) if query.startswith('@') else None
+    users = [exact] if exact else directory.search(search_query, with_usernames=True)
     if not users:
         await message.answer(f"❌ Не найдено по запросу: <b>{html_escape(query)}</b>", parse_mode="HTML")
         return
@@ -100,121 +112,109 @@ async def cmd_info(message: Message):
         await message.answer("\n".join(resp), parse_mode="HTML")
 
 
-@router.message(F.reply_to_message & F.text.regexp(r"^!цитата\b", flags=0))
+@commands.command("цитата", F.reply_to_message)
 async def cmd_quote(message: Message):
     original = message.reply_to_message
     text = original.text or original.caption or ""
     if not text.strip():
         await message.answer("❌ В ответе нет текстовой цитаты.")
         return
-    async with AsyncSessionLocal() as session:
-        quote = Quote(
-            chat_id=message.chat.id,
-            author_user_id=original.from_user.id,
-            author_name=original.from_user.full_name,
-            quoter_user_id=message.from_user.id,
-            text=text.strip()
-        )
-        session.add(quote)
-        await session.commit()
+    # Запись в базу идёт пачкой в фоне
+    write_behind.add_quote(
+        chat_id=message.chat.id,
+        author_user_id=original.from_user.id,
+        author_name=original.from_user.full_name,
+        quoter_user_id=message.from_user.id,
+        text=text.strip()
+    )
     await message.answer(f"📝 Цитата сохранена от <b>{html_escape(original.from_user.full_name)}</b>.", parse_mode="HTML")
     # Генерация картинки будет добавлена отдельно (см. TODO quote_image_gen)
 
 
-@router.message(F.text.regexp(r"^!мудрость\b", flags=0))
-async def cmd_wisdom(message: Message):
-    async with AsyncSessionLocal() as session:
-        result = await session.execute(select(Quote).where(Quote.chat_id == message.chat.id))
-        quotes = result.scalars().all()
-    if not quotes:
+@commands.command("мудрость")
+async def cmd_wisdom(message: Message, session: AsyncSession):
+    q = await quote_picker.pick(message.chat.id, session)
+    if q is None:
         await message.answer("🤷 Нет сохранённых цитат.")
         return
-    q = random.choice(quotes)
 
-    # Попробуем получить аватар автора
-    photo_bytes = None
-    try:
-        photos = await message.bot.get_user_profile_photos(q.author_user_id, limit=1)
-        if photos.total_count > 0:
-            file = await message.bot.get_file(photos.photos[0][0].file_id)
-            photo_bytes = await message.bot.download_file(file.file_path)
-    except Exception:
-        photo_bytes = None
-
-    # Сгенерируем картинку
+    # Карточка: file_id из Telegram, PNG из кэша или новый рендер
+    author = q.author_name or "Неизвестный"
+    photo = None
     try:
-        from PIL import Image, ImageDraw, ImageFont
-        img = Image.new("RGB", (1080, 1080), color=(20, 20, 25))
-        draw = ImageDraw.Draw(img)
-
-        # Аватар (если есть)
-        if photo_bytes:
-            try:
-                avatar = Image.open(BytesIO(photo_bytes.read() if hasattr(photo_bytes, "read") else photo_bytes))
-                avatar = avatar.convert("RGB").resize((200, 200))
-                img.paste(avatar, (50, 50))
-            except Exception:
-                pass
-
-        # Текст
-        margin_left = 280 if photo_bytes else 50
-        try:
-            font_title = ImageFont.truetype("arial.ttf", 48)
-            font_text = ImageFont.truetype("arial.ttf", 44)
-        except Exception:
-            font_title = ImageFont.load_default()
-            font_text = ImageFont.load_default()
-
-        author = q.author_name or "Неизвестный"
-        draw.text((margin_left, 60), author, font=font_title, fill=(255, 255, 255))
-
-        # Разбивка цитаты на строки
-        text = f"«{q.text}»"
-        max_width = 980 - margin_left
-        words = text.split()
-        lines = []
-        current = ""
-        for w in words:
-            test = (current + " " + w).strip()
-            w_width, _ = draw.textbbox((0, 0), test, font=font_text)[2:4]
-            if w_width > max_width and current:
-                lines.append(current)
-                current = w
-            else:
-                current = test
-        if current:
-            lines.append(current)
-
-        y = 140
-        for line in lines[:15]:
-            draw.text((margin_left, y), line, font=font_text, fill=(220, 220, 220))
-            y += 50
-
-        bio = BytesIO()
-        bio.name = "wisdom.png"
-        img.save(bio, "PNG")
-        bio.seek(0)
-        await message.answer_photo(bio, caption=f"🧠 {html_escape(author)}", parse_mode="HTML")
-        return
-    except Exception:
+        photo = await quote_cards.photo_for(message.bot, q)
+        sent = await message.answer_photo(photo, caption=f"🧠 {html_escape(author)}", parse_mode="HTML")
+    except Exception as e:
+        # Сохранённый file_id сбрасываем, только если его отверг Telegram; сеть,
+        # флуд-контроль и перегруженный рендер его не портят
+        if isinstance(e, TelegramBadRequest) and isinstance(photo, str):
+            await quote_cards.forget(session, q)
         # Фоллбек — просто текст
-        pass
+        await message.answer(f"🧠 <b>{html_escape(author)}</b>:\n«{html_escape(q.text)}»", parse_mode="HTML")
+        return
+    await quote_cards.remember(session, q, sent)
+
+
+def _render_quotes_page(search: QuoteSearch, quotes: list, cursor: Cursor | None) -> tuple[str, InlineKeyboardMarkup | None]:
+    if search.query:
+        header = f"🔎 Цитаты по запросу «{html_escape(search.query)}»:"
+    else:
+        header = "📜 Цитаты чата:"
+    lines = [header, ""]
+    for q in quotes:
+        quote_text = q.text if len(q.text) <= 300 else q.text[:300] + "…"
+        date = q.created_at.strftime("%d.%m.%Y") if q.created_at else ""
+        lines.append(f"«{html_escape(quote_text)}»\n— <b>{html_escape(q.author_name or 'Неизвестный')}</b>, {date}\n")
+
+    keyboard = None
+    if cursor is not None:
+        token = quote_searcher.remember(search)
+        keyboard = InlineKeyboardMarkup(inline_keyboard=[[
+            InlineKeyboardButton(text="Дальше ▶", callback_data=f"quotes:{token}:{cursor.encode()}")
+        ]])
+    return "\n".join(lines), keyboard
+
+
+@commands.command("цитаты")
+async def cmd_quotes_search(message: Message, session: AsyncSession):
+    """Поиск по цитатам чата; в ответ на сообщение — только цитаты его автора"""
+    parts = (message.text or "").split(maxsplit=1)
+    query = parts[1].strip() if len(parts) > 1 else None
+    author_id = message.reply_to_message.from_user.id if message.reply_to_message else None
+
+    search = QuoteSearch(chat_id=message.chat.id, query=query, author_id=author_id)
+    quotes, cursor = await quote_searcher.page(search, session=session)
+    if not quotes:
+        await message.answer("🤷 Ничего не нашлось.")
+        return
+    text, keyboard = _render_quotes_page(search, quotes, cursor)
+    await message.answer(text, parse_mode="HTML", reply_markup=keyboard)
+
 
-    await message.answer(f"🧠 <b>{html_escape(q.author_name or 'Неизвестный')}</b>:\n«{html_escape(q.text)}»", parse_mode="HTML")
+@router.callback_query(F.data.startswith("quotes:"))
+async def quotes_next_page(callback: CallbackQuery, session: AsyncSession):
+    _, token, raw_cursor = callback.data.split(":", 2)
+    search = quote_searcher.recall(token)
+    if search is None:
+        await callback.answer("Поиск устарел, повтори команду.", show_alert=True)
+        return
 
+    quotes, cursor = await quote_searcher.page(search, after=Cursor.decode(raw_cursor), session=session)
+    if not quotes:
+        await callback.answer("Больше цитат нет.")
+        return
+    text, keyboard = _render_quotes_page(search, quotes, cursor)
+    await callback.message.edit_text(text, parse_mode="HTML", reply_markup=keyboard)
+    await callback.answer()
 
-@router.message(F.text.regexp(r"^!рулетка\b", flags=0))
-async def cmd_roulette(message: Message):
+
+@commands.command("рулетка")
+async def cmd_roulette(message: Message, session: AsyncSession):
     chamber = random.randint(1, 6)
     if chamber == 1:
         until = datetime.utcnow() + timedelta(minutes=10)
         try:
-            await message.bot.restrict_chat_member(
-                chat_id=message.chat.id,
-                user_id=message.from_user.id,
-                permissions=ChatPermissions(can_send_messages=False),
-                until_date=until
-            )
+            await mute_user(session, message.bot, message.chat.id, message.from_user.id, until, reason='roulette')
             await message.answer(f"🔫 Бах! {message.from_user.mention_html()} замьючен на 10 минут.", parse_mode="HTML")
         except Exception:
             await message.answer("❌ Не удалось выдать мут (нет прав у бота?).")
@@ -222,8 +222,8 @@ async def cmd_roulette(message: Message):
         await message.answer("🎉 Повезло! Патрон в другой каморе.")
 
 
-@router.message(F.text.regexp(r"^!разбудить\s+(.+)$", flags=0))
-async def cmd_wake(message: Message):
+@commands.command("разбудить", pattern=r"^!разбудить\s+(.+)$")
+async def cmd_wake(message: Message, session: AsyncSession):
     raw = (message.text or "").split(maxsplit=1)[1].strip()
     # Ожидаемый формат: DD.MM.YYYY HH:MM
     try:
@@ -231,21 +231,20 @@ async def cmd_wake(message: Message):
     except ValueError:
         await message.answer("❌ Формат времени: 17.11.2025 11:00")
         return
-    async with AsyncSessionLocal() as session:
-        session.add(Wakeup(chat_id=message.chat.id, user_id=message.from_user.id, wake_at=wake_dt))
-        await session.commit()
+    wakeup = Wakeup(chat_id=message.chat.id, user_id=message.from_user.id, wake_at=wake_dt)
+    # INSERT уйдёт при коммите после хендлера; в планировщик — только после него,
+    # иначе другой воркер не найдёт строку
+    session.add(wakeup)
+    after_commit(session, lambda: wakeup_scheduler.schedule(wakeup))
     await message.answer(f"⏰ Ок! Разбужу {message.from_user.mention_html()} в {wake_dt.strftime('%d.%m.%Y %H:%M')}.", parse_mode="HTML")
 
 
-@router.message(F.text.regexp(r"^!орг\sдня\b|^!орг\sдня$", flags=0))
+@commands.command("орг", pattern=r"^!орг\sдня\b")
 async def cmd_org_of_day(message: Message):
-    async with AsyncSessionLocal() as session:
-        result = await session.execute(select(User))
-        users = result.scalars().all()
-    if not users:
+    u = await org_of_day.pick(message.chat.id)
+    if u is None:
         await message.answer("❌ В базе нет организаторов.")
         return
-    u = random.choice(users)
     
     # Формируем сообщение с тегом
     user_name = html_escape(u.full_name)
@@ -259,13 +258,13 @@ async def cmd_org_of_day(message: Message):
     await message.answer(response, parse_mode="HTML")
 
 
-@router.message(F.reply_to_message & F.text.regexp(r"^!нахуй\b", flags=0))
+@commands.command("нахуй", F.reply_to_message)
 async def cmd_go_away(message: Message):
     target = message.reply_to_message.from_user
     await message.answer(f"{target.mention_html()} иди нахуй", parse_mode="HTML")
 
 
-@router.message(F.text.regexp(r"^!когда\b", flags=0))
+@commands.command("когда")
 async def cmd_when(message: Message):
     target = datetime.strptime("27.11.2025 00:00", "%d.%m.%Y %H:%M")
     now = datetime.utcnow()
@@ -279,57 +278,19 @@ async def cmd_when(message: Message):
     await message.answer(f"⏳ Осталось: {days} дн. {hours} ч. {minutes} мин.")
 
 
-@router.message(F.text.regexp(r"^!вероятность(?:\s+.+)?$", flags=0))
+@commands.command("вероятность", pattern=r"^!вероятность(?:\s+.+)?$")
 async def cmd_probability(message: Message):
     p = random.randint(0, 100)
     await message.answer(f"📊 Вероятность: {p}%")
 
 
-@router.message(F.text.regexp(r"^!пиво\b", flags=0))
-async def cmd_beer_pour(message: Message):
-    # Проверяем, есть ли у пользователя "ТП" в поле department
-    user_id = message.from_user.id
-    username = (message.from_user.username or "").lower().strip()
-    user_full_name = message.from_user.full_name or ""
-    
-    async with AsyncSessionLocal() as session:
-        # Ищем пользователя по telegram_id, telegram_username или по имени
-        conditions = [User.telegram_id == user_id]
-        
-        if username:
-            conditions.append(User.telegram_username.ilike(f"%{username}%"))
-        
-        if user_full_name:
-            conditions.append(User.full_name.ilike(f"%{user_full_name}%"))
-        
-        result = await session.execute(
-            select(User).where(or_(*conditions))
-        )
-        user = result.scalar_one_or_none()
-        
-        # Если не нашли по точному совпадению, пробуем найти по части имени
-        if not user and user_full_name:
-            # Берем первую часть имени (фамилию)
-            name_parts = user_full_name.split()
-            if name_parts:
-                first_name_part = name_parts[0]
-                result = await session.execute(
-                    select(User).where(User.full_name.ilike(f"%{first_name_part}%"))
-                )
-                users = result.scalars().all()
-                # Если нашли одного - используем его
-                if len(users) == 1:
-                    user = users[0]
-        
-        # Проверяем, есть ли "ТП" в department
-        has_tp = False
-        if user and user.department:
-            has_tp = "ТП" in user.department.upper()
-        
-        # Если пользователь не найден в базе или не является ТП - запрещаем
-        if not has_tp:
-            await message.answer("Пиво только для тп, остальным компотик 😘😜😁😆🖤")
-            return
+@commands.command("пиво")
+async def cmd_beer_pour(message: Message, session: AsyncSession):
+    # Пиво наливают только организаторы из ТП (подразделение из справочника)
+    identity = await identity_resolver.resolve(session, message.from_user)
+    if not identity.is_tp:
+        await message.answer("Пиво только для тп, остальным компотик 😘😜😁😆🖤")
+        return
     
     # Ожидаем ответ на сообщение пользователя или упоминание
     target_id = None
@@ -344,43 +305,27 @@ async def cmd_beer_pour(message: Message):
     if not target_id:
         await message.answer("🍺 Используй как ответ на сообщение того, кому наливаешь пиво.")
         return
-    async with AsyncSessionLocal() as session:
-        result = await session.execute(
-            select(BeerStat).where(BeerStat.chat_id == message.chat.id, BeerStat.user_id == target_id)
-        )
-        stat = result.scalar_one_or_none()
-        if stat:
-            stat.count += 1
-            stat.username = target_name
-        else:
-            stat = BeerStat(chat_id=message.chat.id, user_id=target_id, username=target_name, count=1)
-            session.add(stat)
-        await session.commit()
+    beer_leaderboard.record(message.chat.id, target_id, target_name)
     await message.answer(f"🍻 Налито пива для {message.reply_to_message.from_user.mention_html()}! (+1)", parse_mode="HTML")
 
 
-@router.message(F.text.regexp(r"^!статистика\s+пива\b|^!статистика\b", flags=0))
+@commands.command("статистика")
 async def cmd_beer_stats(message: Message):
-    async with AsyncSessionLocal() as session:
-        result = await session.execute(select(BeerStat).where(BeerStat.chat_id == message.chat.id))
-        stats = result.scalars().all()
-    if not stats:
+    top = await beer_leaderboard.top(message.chat.id, settings.BEER_TOP_SIZE)
+    if not top:
         await message.answer("🍺 Пока никому не наливали.")
         return
-    stats.sort(key=lambda s: s.count, reverse=True)
     lines = ["🍺 Топ пивных друзей:\n"]
-    for i, s in enumerate(stats, 1):
-        display = s.username or f"id:{s.user_id}"
-        lines.append(f"{i}. {html_escape(display)} — {s.count}")
+    for i, (user_id, username, count) in enumerate(top, 1):
+        display = username or f"id:{user_id}"
+        lines.append(f"{i}. {html_escape(display)} — {count}")
     await message.answer("\n".join(lines))
 
 
-@router.message(F.text.regexp(r"^!адрес\s+(.+)", flags=0))
+@commands.command("адрес", pattern=r"^!адрес\s+(.+)")
 async def cmd_address(message: Message):
     surname = (message.text or "").split(maxsplit=1)[1].strip()
-    async with AsyncSessionLocal() as session:
-        result = await session.execute(select(User).where(User.full_name.ilike(f"%{surname}%")))
-        users = result.scalars().all()
+    users = directory.search(surname)
     if not users:
         await message.answer("❌ Не найдено.")
         return
@@ -391,26 +336,22 @@ async def cmd_address(message: Message):
     await message.answer(f"🏠 Адрес {html_escape(user.full_name)}:\n{html_escape(user.address)}")
 
 
-@router.message(F.reply_to_message & F.text.regexp(r"^!обосновать\b", flags=0))
+@commands.command("обосновать", F.reply_to_message)
 async def cmd_obosnovat(message: Message):
     target = message.reply_to_message.from_user
     await message.answer(f"{target.mention_html()} а тебя это ебать не должно", parse_mode="HTML")
 
 
-@router.message(F.text.regexp(r"^!кто\s+(.+)", flags=0))
+@commands.command("кто", pattern=r"^!кто\s+(.+)")
 async def cmd_who(message: Message):
     """Выбирает случайного человека и отправляет сообщение с упоминанием"""
     text = (message.text or "").split(maxsplit=1)[1].strip()
     
-    async with AsyncSessionLocal() as session:
-        result = await session.execute(select(User))
-        users = result.scalars().all()
-    
-    if not users:
+    user = await random_organizer()
+    if user is None:
         await message.answer("❌ В базе нет организаторов.")
         return
     
-    user = random.choice(users)
     user_name = html_escape(user.full_name)
     
     # Формируем сообщение в формате: {текст} - {человек} (без тега)
@@ -419,7 +360,7 @@ async def cmd_who(message: Message):
     await message.answer(response, parse_mode="HTML")
 
 
-@router.message(F.text.regexp(r"^!перепарсить\b", flags=0))
+@commands.command("перепарсить")
 async def cmd_reparse(message: Message):
     """Перезагружает данные из Excel файла"""
     # Проверяем права администратора
@@ -453,14 +394,23 @@ async def cmd_reparse(message: Message):
     
     try:
         # Загружаем данные
-        await load_users_from_excel(excel_file)
-        await message.answer("✅ Данные успешно перезагружены из Excel файла!")
+        summary = await load_users_from_excel(excel_file)
+        if summary.file_unchanged:
+            await message.answer("✅ Файл не изменился с последней загрузки.")
+        else:
+            await message.answer(
+                "✅ Данные успешно перезагружены из Excel файла!\n\n"
+                f"➕ Добавлено: {len(summary.added)}\n"
+                f"♻️ Обновлено: {len(summary.updated)}\n"
+                f"🗑 Удалено: {len(summary.deleted)}\n"
+                f"💤 Без изменений: {summary.unchanged}"
+            )
     except Exception as e:
         await message.answer(f"❌ Ошибка при загрузке данных: {html_escape(str(e))}", parse_mode="HTML")
 
 
-@router.message(F.reply_to_message & F.text.regexp(r"^!дуель\b", flags=0))
-async def cmd_duel(message: Message):
+@commands.command("дуель", F.reply_to_message)
+async def cmd_duel(message: Message, session: AsyncSession):
     """Дуэль: рандомно мьютит одного из двух участников на 10 минут"""
     if message.chat.type == 'private':
         await message.answer("❌ Эта команда доступна только в групповых чатах!")
@@ -479,12 +429,7 @@ async def cmd_duel(message: Message):
     
     until = datetime.utcnow() + timedelta(minutes=10)
     try:
-        await message.bot.restrict_chat_member(
-            chat_id=message.chat.id,
-            user_id=loser.id,
-            permissions=ChatPermissions(can_send_messages=False),
-            until_date=until
-        )
+        await mute_user(session, message.bot, message.chat.id, loser.id, until, reason='duel')
         await message.answer(
             f"⚔️ Дуэль! {loser.mention_html()} проиграл и замьючен на 10 минут. "
             f"{winner.mention_html()} победил! 🎉",
@@ -494,8 +439,8 @@ async def cmd_duel(message: Message):
         await message.answer(f"❌ Не удалось выдать мут (нет прав у бота?). Ошибка: {str(e)}")
 
 
-@router.message(F.reply_to_message & F.text.regexp(r"^!матдуэль\b", flags=0))
-async def cmd_math_duel(message: Message):
+@commands.command("матдуэль", F.reply_to_message)
+async def cmd_math_duel(message: Message, session: AsyncSession):
     """Математическая дуэль: кто первый правильно ответит, тот выиграл"""
     if message.chat.type == 'private':
         await message.answer("❌ Эта команда доступна только в групповых чатах!")
@@ -513,47 +458,48 @@ async def cmd_math_duel(message: Message):
     num2 = random.randint(100, 999)
     correct_answer = num1 + num2
     
-    async with AsyncSessionLocal() as session:
-        # Проверяем, нет ли уже активной дуэли между этими пользователями
-        result = await session.execute(
-            select(MathDuel).where(
-                MathDuel.chat_id == message.chat.id,
-                MathDuel.expired == False,
-                or_(
-                    and_(MathDuel.user1_id == challenger.id, MathDuel.user2_id == target.id),
-                    and_(MathDuel.user1_id == target.id, MathDuel.user2_id == challenger.id)
-                )
+    # Проверяем, нет ли уже активной дуэли между этими пользователями
+    result = await session.execute(
+        select(MathDuel).where(
+            MathDuel.chat_id == message.chat.id,
+            MathDuel.expired == False,
+            MathDuel.created_at > math_duels.cutoff(),
+            or_(
+                and_(MathDuel.user1_id == challenger.id, MathDuel.user2_id == target.id),
+                and_(MathDuel.user1_id == target.id, MathDuel.user2_id == challenger.id)
             )
         )
-        existing_duel = result.scalar_one_or_none()
-        
-        if existing_duel:
-            await message.answer("❌ У вас уже есть активная дуэль! Сначала завершите её.")
-            return
-        
-        # Создаем новую дуэль
-        duel = MathDuel(
-            chat_id=message.chat.id,
-            user1_id=challenger.id,
-            user2_id=target.id,
-            num1=num1,
-            num2=num2,
-            correct_answer=correct_answer
-        )
-        session.add(duel)
-        await session.commit()
+    )
+    existing_duel = result.scalar_one_or_none()
+    
+    if existing_duel:
+        await message.answer("❌ У вас уже есть активная дуэль! Сначала завершите её.")
+        return
+    
+    # Создаем новую дуэль
+    duel = MathDuel(
+        chat_id=message.chat.id,
+        user1_id=challenger.id,
+        user2_id=target.id,
+        num1=num1,
+        num2=num2,
+        correct_answer=correct_answer
+    )
+    session.add(duel)
+    after_commit(session, lambda: math_duels.add(duel))
     
     await message.answer(
         f"🧮 Математическая дуэль!\n\n"
         f"{challenger.mention_html()} vs {target.mention_html()}\n\n"
         f"Сколько будет: <b>{num1} + {num2}</b>?\n\n"
-        f"Кто первый напишет правильный ответ - выиграл! Проигравший в мут на 10 минут!",
+        f"Кто первый напишет правильный ответ - выиграл! Проигравший в мут на 10 минут!\n"
+        f"На ответ {settings.MATH_DUEL_TIMEOUT // 60} мин.",
         parse_mode="HTML"
     )
 
 
-@router.message(F.text.regexp(r"^!анмут\b", flags=0))
-async def cmd_unmute_all(message: Message):
+@commands.command("анмут")
+async def cmd_unmute_all(message: Message, session: AsyncSession):
     """Размучивает всех пользователей в чате"""
     if message.chat.type == 'private':
         await message.answer("❌ Эта команда доступна только в групповых чатах!")
@@ -566,72 +512,25 @@ async def cmd_unmute_all(message: Message):
         return
     
     try:
-        # Получаем список администраторов для получения полных прав
-        full_permissions = ChatPermissions(
-            can_send_messages=True,
-            can_send_audios=True,
-            can_send_documents=True,
-            can_send_photos=True,
-            can_send_videos=True,
-            can_send_video_notes=True,
-            can_send_voice_notes=True,
-            can_send_polls=True,
-            can_send_other_messages=True,
-            can_add_web_page_previews=True,
-            can_change_info=True,
-            can_invite_users=True,
-            can_pin_messages=True
-        )
-        
-        unmuted_count = 0
-        # Пробуем размутить известных пользователей из базы данных (из статистики пива и цитат)
-        async with AsyncSessionLocal() as session:
-            # Получаем всех уникальных user_id из различных таблиц
-            from sqlalchemy import distinct
-            result = await session.execute(
-                select(distinct(BeerStat.user_id)).where(BeerStat.chat_id == message.chat.id)
-            )
-            user_ids = [row[0] for row in result.all()]
-            
-            result = await session.execute(
-                select(distinct(Quote.author_user_id)).where(Quote.chat_id == message.chat.id)
-            )
-            quote_user_ids = [row[0] for row in result.all()]
-            user_ids.extend(quote_user_ids)
-            
-            # Убираем дубликаты
-            user_ids = list(set(user_ids))
-        
-        # Пробуем размутить каждого пользователя
-        for user_id in user_ids:
-            try:
-                member = await message.bot.get_chat_member(message.chat.id, user_id)
-                if member.status == 'restricted' and not member.can_send_messages:
-                    await message.bot.restrict_chat_member(
-                        chat_id=message.chat.id,
-                        user_id=user_id,
-                        permissions=full_permissions
-                    )
-                    unmuted_count += 1
-            except Exception:
-                pass
+        # Снимаем только муты, выданные ботом (массовая операция — низкий приоритет)
+        with outbound.lane(Priority.BULK):
+            unmuted_count = await unmute_tracked(session, message.bot, message.chat.id)
         
         if unmuted_count > 0:
             await message.answer(f"✅ Размучено пользователей: {unmuted_count}")
         else:
-            await message.answer("ℹ️ Нет замученных пользователей в этом чате (или они не найдены в базе).")
+            await message.answer("ℹ️ Нет замученных ботом пользователей в этом чате.")
     except Exception as e:
         await message.answer(f"❌ Ошибка при размуте: {html_escape(str(e))}", parse_mode="HTML")
 
 
-@router.message(F.text.regexp(r"^!пиздануть\b", flags=0))
-async def cmd_mention_all(message: Message):
+@commands.command("пиздануть")
+async def cmd_mention_all(message: Message, session: AsyncSession):
     """Отмечает всех участников из базы данных по их telegram_username"""
-    async with AsyncSessionLocal() as session:
-        result = await session.execute(
-            select(User).where(User.telegram_username.isnot(None))
-        )
-        users = result.scalars().all()
+    result = await session.execute(
+        select(User).where(User.telegram_username.isnot(None))
+    )
+    users = result.scalars().all()
     
     if not users:
         await message.answer("❌ В базе нет пользователей с указанным telegram_username.")
@@ -658,16 +557,17 @@ async def cmd_mention_all(message: Message):
         mention_text = " ".join(mentions)
         await message.answer(f"{mention_text}\n\n📢 Всего участников: {len(mentions)}")
     else:
-        # Разбиваем на части
-        for i in range(0, len(mentions), chunk_size):
-            chunk = mentions[i:i + chunk_size]
-            mention_text = " ".join(chunk)
-            await message.answer(mention_text)
-        await message.answer(f"📢 Всего участников: {len(mentions)}")
-
-# Обработчик ответов на математическую дуэль
-@router.message(F.text.regexp(r"^\d+$", flags=0))
-async def handle_math_duel_answer(message: Message):
+        # Разбиваем на части; рассылка идёт в низкоприоритетной очереди
+        with outbound.lane(Priority.BULK):
+            for i in range(0, len(mentions), chunk_size):
+                chunk = mentions[i:i + chunk_size]
+                mention_text = " ".join(chunk)
+                await message.answer(mention_text)
+            await message.answer(f"📢 Всего участников: {len(mentions)}")
+
+# Обработчик ответов на математическую дуэль: индекс дуэлей проверяется до регулярки
+@router.message(math_duels, F.text.regexp(r"^\d+$", flags=0))
+async def handle_math_duel_answer(message: Message, session: AsyncSession):
     """Обрабатывает ответы на математическую дуэль"""
     if message.chat.type == 'private':
         return
@@ -679,63 +579,58 @@ async def handle_math_duel_answer(message: Message):
     
     user_id = message.from_user.id
     
-    async with AsyncSessionLocal() as session:
-        # Ищем активную дуэль с участием этого пользователя
-        result = await session.execute(
-            select(MathDuel).where(
-                MathDuel.chat_id == message.chat.id,
-                MathDuel.expired == False,
-                or_(
-                    MathDuel.user1_id == user_id,
-                    MathDuel.user2_id == user_id
-                )
+    # Ищем активную дуэль с участием этого пользователя
+    result = await session.execute(
+        select(MathDuel).where(
+            MathDuel.chat_id == message.chat.id,
+            MathDuel.expired == False,
+            MathDuel.created_at > math_duels.cutoff(),
+            or_(
+                MathDuel.user1_id == user_id,
+                MathDuel.user2_id == user_id
             )
         )
-        duel = result.scalar_one_or_none()
+    )
+    duel = result.scalar_one_or_none()
+    
+    if not duel:
+        return
+    
+    # Проверяем правильность ответа
+    if answer == duel.correct_answer:
+        # Правильный ответ - этот пользователь выиграл
+        winner = message.from_user
+        loser_id = duel.user2_id if duel.user1_id == winner.id else duel.user1_id
         
-        if not duel:
-            return
+        # Получаем информацию о проигравшем
+        try:
+            loser_member = await message.bot.get_chat_member(message.chat.id, loser_id)
+            loser_name = loser_member.user.full_name
+        except Exception:
+            loser_name = f"id:{loser_id}"
         
-        # Проверяем правильность ответа
-        if answer == duel.correct_answer:
-            # Правильный ответ - этот пользователь выиграл
-            winner = message.from_user
-            loser_id = duel.user2_id if duel.user1_id == winner.id else duel.user1_id
-            
-            # Получаем информацию о проигравшем
-            try:
-                loser_member = await message.bot.get_chat_member(message.chat.id, loser_id)
-                loser_name = loser_member.user.full_name
-            except Exception:
-                loser_name = f"id:{loser_id}"
-            
-            # Мьютим проигравшего
-            until = datetime.utcnow() + timedelta(minutes=10)
-            try:
-                await message.bot.restrict_chat_member(
-                    chat_id=message.chat.id,
-                    user_id=loser_id,
-                    permissions=ChatPermissions(can_send_messages=False),
-                    until_date=until
-                )
-            except Exception:
-                pass
-            
-            # Помечаем дуэль как завершенную
-            duel.winner_id = winner.id
-            duel.expired = True
-            await session.commit()
-            
-            await message.answer(
-                f"🎉 {winner.mention_html()} выиграл математическую дуэль!\n\n"
-                f"Правильный ответ: <b>{duel.correct_answer}</b>\n"
-                f"Проигравший {loser_name} замьючен на 10 минут!",
-                parse_mode="HTML"
-            )
-        # Если ответ неправильный, просто игнорируем (не сообщаем об ошибке, чтобы не спамить)
+        # Мьютим проигравшего
+        until = datetime.utcnow() + timedelta(minutes=10)
+        try:
+            await mute_user(session, message.bot, message.chat.id, loser_id, until, reason='math_duel')
+        except Exception:
+            pass
+        
+        # Помечаем дуэль как завершенную
+        duel.winner_id = winner.id
+        duel.expired = True
+        after_commit(session, lambda: math_duels.remove(duel.id))
+        
+        await message.answer(
+            f"🎉 {winner.mention_html()} выиграл математическую дуэль!\n\n"
+            f"Правильный ответ: <b>{duel.correct_answer}</b>\n"
+            f"Проигравший {loser_name} замьючен на 10 минут!",
+            parse_mode="HTML"
+        )
+    # Если ответ неправильный, просто игнорируем (не сообщаем об ошибке, чтобы не спамить)
 
 
-@router.message(F.text.regexp(r"^!вокабулар\b", flags=0))
+@commands.command("вокабулар")
 async def cmd_vocabulary(message: Message):
     """Отправляет словарь сленговых слов"""
     vocab_text = """📚 <b>ВОКАБУЛЯР</b>
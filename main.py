@@ -1,16 +1,25 @@
 import asyncio
 import logging
+import multiprocessing
 from aiogram import Bot, Dispatcher
 from aiogram.client.default import DefaultBotProperties
 from aiogram.enums import ParseMode
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+from aiohttp import web
 
 from config import settings
 from handlers import chat_init, orgkom_handlers, user_handlers
-from database.engine import AsyncSessionLocal
-from database.models import Wakeup
-from sqlalchemy import select
-from datetime import datetime
-import asyncio
+from middlewares import ChatTypeMiddleware, DbSessionMiddleware, MetricsMiddleware
+from services.chat_registry import chat_registry
+from services.directory import directory
+from services.excel_watcher import excel_watcher
+from services.math_duels import math_duels
+from services.metrics import start_metrics_server, telegram_timer
+from services.mutes import mute_ledger
+from services.outbound import outbound
+from services.quote_cards import render_pool
+from services.wakeups import wakeup_scheduler
+from services.write_behind import write_behind
 
 # Настройка логирования
 logging.basicConfig(
@@ -19,59 +28,180 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Ссылки на фоновые задачи, чтобы их не собрал GC и можно было отменить при остановке
+background_tasks: set[asyncio.Task] = set()
+metrics_runners: list[web.AppRunner] = []
+
+
+def start_background(task: asyncio.Task):
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
 
-async def main():
-    """Главная функция для запуска бота"""
-    # Инициализация бота и диспетчера
+
+def create_bot() -> Bot:
     bot = Bot(
         token=settings.BOT_TOKEN,
         default=DefaultBotProperties(parse_mode=ParseMode.HTML)
     )
-    dp = Dispatcher()
-    
+    # Все исходящие запросы проходят через общую очередь с лимитами
+    bot.session.middleware(outbound)
+    # Время самих запросов к Bot API (уже после ожидания в очереди)
+    bot.session.middleware(telegram_timer)
+    return bot
+
+
+def create_dispatcher(is_primary: bool = True, worker_id: int = 0) -> Dispatcher:
+    """
+    Создаёт диспетчер с роутерами и middleware.
+    is_primary — этот процесс отвечает за регистрацию webhook.
+    """
+    dp = Dispatcher(is_primary=is_primary, worker_id=worker_id)
+
+    # Тип чата из реестра для всех хендлеров
+    dp.message.outer_middleware(ChatTypeMiddleware())
+    dp.callback_query.outer_middleware(ChatTypeMiddleware())
+
+    # Метрики по хендлерам (внутренний middleware видит выбранный хендлер)
+    # и одна сессия БД на апдейт; коммит попадает во время хендлера
+    for observer in (dp.message, dp.callback_query, dp.my_chat_member):
+        observer.middleware(MetricsMiddleware())
+        observer.middleware(DbSessionMiddleware())
+
     # Подключаем роутеры
     dp.include_router(chat_init.router)
     dp.include_router(orgkom_handlers.router)
     dp.include_router(user_handlers.router)
-    
-    logger.info("🚀 Бот запускается...")
-
-    async def wakeup_scheduler():
-        """Периодически проверяет запланированные побудки и отправляет уведомления."""
-        while True:
-            try:
-                now = datetime.utcnow()
-                async with AsyncSessionLocal() as session:
-                    result = await session.execute(
-                        select(Wakeup).where(Wakeup.done == False, Wakeup.wake_at <= now)
-                    )
-                    due = result.scalars().all()
-                    for w in due:
-                        try:
-                            await bot.send_message(
-                                w.chat_id,
-                                f"⏰ Пора вставать! <a href=\"tg://user?id={w.user_id}\">тебя</a>",
-                                parse_mode="HTML"
-                            )
-                        finally:
-                            w.done = True
-                    if due:
-                        await session.commit()
-            except Exception as e:
-                logger.exception("Wakeup scheduler error: %s", e)
-            await asyncio.sleep(30)
-    
-    try:
-        # Удаляем старые апдейты и запускаем polling
-        asyncio.create_task(wakeup_scheduler())
+
+    dp.startup.register(on_startup)
+    dp.shutdown.register(on_shutdown)
+    return dp
+
+
+async def on_startup(bot: Bot, dispatcher: Dispatcher, is_primary: bool, worker_id: int):
+    """Загружает кэши и планировщик; основной процесс также настраивает webhook"""
+    # Загружаем справочник организаторов, реестр чатов, журнал мутов и дуэли в память
+    await directory.reload()
+    await chat_registry.load()
+    await mute_ledger.load()
+    await math_duels.load()
+
+    render_pool.start()
+
+    # На каждом воркере: побудку отправляет тот, кто первым пометил строку,
+    # а буфер записи у каждого процесса свой
+    start_background(await wakeup_scheduler.start(bot))
+    start_background(write_behind.start())
+    if is_primary:
+        # Пометка просроченных дуэлей в базе — одна на все воркеры
+        start_background(math_duels.start())
+
+    if settings.USER_DATA_WATCH:
+        # Импортирует файл только основной процесс, остальные подхватывают результат
+        start_background(await excel_watcher.start(primary=is_primary))
+
+    if settings.METRICS_ENABLED:
+        port = settings.METRICS_PORT + worker_id
+        metrics_runners.append(await start_metrics_server(settings.METRICS_HOST, port))
+        logger.info("📈 Метрики: http://%s:%d/metrics", settings.METRICS_HOST, port)
+
+    if not is_primary:
+        return
+
+    if settings.BOT_MODE == 'webhook':
+        await bot.set_webhook(
+            settings.webhook_url,
+            secret_token=settings.WEBHOOK_SECRET or None,
+            allowed_updates=dispatcher.resolve_used_update_types(),
+            drop_pending_updates=True
+        )
+        logger.info("🌐 Webhook установлен: %s", settings.webhook_url)
+    else:
+        # Удаляем webhook и старые апдейты перед polling
         await bot.delete_webhook(drop_pending_updates=True)
+
+
+async def on_shutdown():
+    for task in list(background_tasks):
+        task.cancel()
+    # Дописываем в базу всё, что ещё лежит в буфере
+    await write_behind.flush()
+    render_pool.close()
+    for runner in metrics_runners:
+        await runner.cleanup()
+    metrics_runners.clear()
+
+
+async def run_polling():
+    """Запуск бота в режиме long polling"""
+    bot = create_bot()
+    dp = create_dispatcher()
+
+    logger.info("🚀 Бот запускается (polling)...")
+    try:
         await dp.start_polling(bot, allowed_updates=dp.resolve_used_update_types())
     finally:
         await bot.session.close()
 
 
+async def health(request: web.Request) -> web.Response:
+    return web.json_response({"status": "ok", "worker": request.app["worker_id"]})
+
+
+def run_webhook_worker(worker_id: int):
+    """Один процесс aiohttp-сервера; несколько воркеров делят порт через SO_REUSEPORT"""
+    bot = create_bot()
+    dp = create_dispatcher(is_primary=worker_id == 0, worker_id=worker_id)
+
+    app = web.Application()
+    app["worker_id"] = worker_id
+    app.router.add_get(settings.WEBHOOK_HEALTH_PATH, health)
+    SimpleRequestHandler(
+        dispatcher=dp,
+        bot=bot,
+        secret_token=settings.WEBHOOK_SECRET or None
+    ).register(app, path=settings.WEBHOOK_PATH)
+    setup_application(app, dp, bot=bot)
+
+    logger.info("🚀 Воркер %d слушает %s:%d", worker_id, settings.WEBAPP_HOST, settings.WEBAPP_PORT)
+    web.run_app(
+        app,
+        host=settings.WEBAPP_HOST,
+        port=settings.WEBAPP_PORT,
+        reuse_port=settings.WEBHOOK_WORKERS > 1,
+        print=None
+    )
+
+
+def run_webhook():
+    """Запуск бота в режиме webhook с WEBHOOK_WORKERS процессами"""
+    if not settings.WEBHOOK_BASE_URL:
+        raise RuntimeError("Для BOT_MODE=webhook нужно указать WEBHOOK_BASE_URL")
+
+    workers = max(1, settings.WEBHOOK_WORKERS)
+    if workers == 1:
+        run_webhook_worker(0)
+        return
+
+    processes = [
+        multiprocessing.Process(target=run_webhook_worker, args=(worker_id,), name=f"webhook-{worker_id}")
+        for worker_id in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    try:
+        for process in processes:
+            process.join()
+    finally:
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+
+
 if __name__ == '__main__':
     try:
-        asyncio.run(main())
+        if settings.BOT_MODE == 'webhook':
+            run_webhook()
+        else:
+            asyncio.run(run_polling())
     except KeyboardInterrupt:
         logger.info("⛔️ Бот остановлен")
@@ -0,0 +1,9 @@
+"""
+Пакет с middleware для диспетчера aiogram
+"""
+
+from .chat_type import ChatTypeMiddleware
+from .db_session import DbSessionMiddleware
+from .metrics import MetricsMiddleware
+
+__all__ = ['ChatTypeMiddleware', 'DbSessionMiddleware', 'MetricsMiddleware']
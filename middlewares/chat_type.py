@@ -0,0 +1,23 @@
+from typing import Any, Awaitable, Callable
+
+from aiogram import BaseMiddleware
+from aiogram.types import Chat, TelegramObject
+
+from services.chat_registry import chat_registry
+
+
+class ChatTypeMiddleware(BaseMiddleware):
+    """
+    Добавляет в данные хендлера `chat_type` — тип текущего чата из реестра
+    ('organizers', 'participants' или None, если чат не настроен).
+    """
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any],
+    ) -> Any:
+        chat: Chat | None = data.get("event_chat")
+        data["chat_type"] = await chat_registry.chat_type(chat.id) if chat else None
+        return await handler(event, data)
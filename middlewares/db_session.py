@@ -0,0 +1,37 @@
+from typing import Any, Awaitable, Callable
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+from sqlalchemy.orm import sessionmaker
+
+from database.engine import AsyncSessionLocal, run_after_commit
+
+
+class DbSessionMiddleware(BaseMiddleware):
+    """
+    Внутренний middleware: одна сессия БД на апдейт в данных хендлера как
+    `session`. Соединение из пула AsyncSession берёт только при первом запросе,
+    поэтому хендлеры без обращений к базе ничего не стоят. После хендлера
+    изменения сбрасываются и коммитятся один раз, при исключении — откат.
+    """
+
+    def __init__(self, session_factory: sessionmaker = AsyncSessionLocal):
+        self.session_factory = session_factory
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any],
+    ) -> Any:
+        async with self.session_factory() as session:
+            data["session"] = session
+            try:
+                result = await handler(event, data)
+            except Exception:
+                await session.rollback()
+                raise
+            # Без запросов и изменений коммит не трогает соединение
+            await session.commit()
+            run_after_commit(session)
+            return result
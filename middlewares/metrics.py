@@ -0,0 +1,46 @@
+import time
+from typing import Any, Awaitable, Callable
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+
+from services.metrics import metrics
+
+
+def _handler_name(data: dict[str, Any]) -> str:
+    # !-команды идут через общий диспетчер CommandTable — берём настоящий хендлер
+    entry = data.get("command_entry")
+    handler = entry.callback if entry is not None else data.get("handler")
+    callback = getattr(handler, "callback", None)
+    if callback is None:
+        return "unknown"
+    module = callback.__module__.rsplit(".", 1)[-1]
+    return f"{module}.{callback.__name__}"
+
+
+class MetricsMiddleware(BaseMiddleware):
+    """
+    Внутренний middleware: срабатывает после фильтров, когда хендлер уже
+    выбран, и считает для него вызовы, ошибки и длительность. Время БД и
+    Telegram внутри хендлера собирает services.metrics.
+    """
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any],
+    ) -> Any:
+        name = _handler_name(data)
+        stats = metrics.handlers[name]
+        token = metrics.enter(name)
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        except Exception:
+            stats.errors += 1
+            raise
+        finally:
+            stats.calls += 1
+            stats.observe(time.perf_counter() - started)
+            metrics.exit(token)
@@ -0,0 +1,5 @@
+"""
+Пакет с сервисами бота: кэши, индексы и фоновые задачи
+"""
+
+__all__ = ['beer', 'cache', 'card_render', 'chat_registry', 'directory', 'excel_watcher', 'identity', 'leaderboard', 'math_duels', 'metrics', 'moderation', 'mutes', 'organizers', 'outbound', 'quote_cards', 'quote_picker', 'quote_search', 'wakeups', 'write_behind']
@@ -0,0 +1,30 @@
+"""
+Счётчики !пиво.
+
+Наливания копит services.write_behind и сбрасывает пачкой через beer_upsert —
+атомарный INSERT ... ON CONFLICT (chat_id, user_id) DO UPDATE SET count =
+count + n: без чтения перед записью, поэтому одновременные наливания (в том
+числе из разных воркеров) не теряют инкременты и не плодят дубли.
+"""
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database.dialect import dialect_insert
+from database.models import BeerStat
+
+
+def beer_upsert(session: AsyncSession, rows: list[dict]):
+    """
+    Пакетный upsert счётчиков: rows — словари chat_id, user_id, username,
+    count, updated_at. Пара (chat_id, user_id) в пачке должна быть уникальной.
+    """
+    stmt = dialect_insert(session, BeerStat).values(rows)
+    return stmt.on_conflict_do_update(
+        index_elements=[BeerStat.chat_id, BeerStat.user_id],
+        set_={
+            'count': BeerStat.count + stmt.excluded['count'],
+            'username': stmt.excluded.username,
+            'updated_at': stmt.excluded.updated_at,
+        }
+    )
+
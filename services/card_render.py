@@ -0,0 +1,80 @@
+"""
+Рисование карточек цитат (PIL).
+
+Модуль без зависимостей от бота и БД: его функции выполняются в пуле процессов,
+куда передаются только текст и байты аватара.
+"""
+from functools import lru_cache
+from io import BytesIO
+
+CARD_SIZE = 1080
+AVATAR_SIZE = 200
+MAX_LINES = 15
+
+
+@lru_cache(maxsize=None)
+def _font(size: int):
+    from PIL import ImageFont
+    try:
+        return ImageFont.truetype("arial.ttf", size)
+    except Exception:
+        return ImageFont.load_default()
+
+
+def warm_up() -> None:
+    """Прогрев процесса пула: импорт PIL и загрузка шрифтов"""
+    _font(48)
+    _font(44)
+
+
+def _wrap(text: str, font, max_width: float) -> list[str]:
+    """Переносит текст по словам; ширина каждого слова измеряется один раз"""
+    space = font.getlength(" ")
+    lines = []
+    current: list[str] = []
+    width = 0.0
+    for word in text.split():
+        word_width = font.getlength(word)
+        new_width = word_width if not current else width + space + word_width
+        if new_width > max_width and current:
+            lines.append(" ".join(current))
+            if len(lines) == MAX_LINES:
+                return lines
+            current, width = [word], word_width
+        else:
+            current.append(word)
+            width = new_width
+    if current:
+        lines.append(" ".join(current))
+    return lines[:MAX_LINES]
+
+
+def render_card(author: str, text: str, avatar: bytes | None) -> bytes:
+    """Рисует карточку цитаты и возвращает PNG"""
+    from PIL import Image, ImageDraw
+
+    img = Image.new("RGB", (CARD_SIZE, CARD_SIZE), color=(20, 20, 25))
+    draw = ImageDraw.Draw(img)
+
+    # Аватар (если есть)
+    has_avatar = False
+    if avatar:
+        try:
+            picture = Image.open(BytesIO(avatar)).convert("RGB").resize((AVATAR_SIZE, AVATAR_SIZE))
+            img.paste(picture, (50, 50))
+            has_avatar = True
+        except Exception:
+            pass
+
+    margin_left = 280 if has_avatar else 50
+    draw.text((margin_left, 60), author, font=_font(48), fill=(255, 255, 255))
+
+    font_text = _font(44)
+    y = 140
+    for line in _wrap(f"«{text}»", font_text, 980 - margin_left):
+        draw.text((margin_left, y), line, font=font_text, fill=(220, 220, 220))
+        y += 50
+
+    bio = BytesIO()
+    img.save(bio, "PNG")
+    return bio.getvalue()
@@ -0,0 +1,70 @@
+"""
+Реестр зарегистрированных чатов в памяти.
+
+Тип чата меняется крайне редко, поэтому строки таблицы chats держим в словаре
+и не ходим в базу на каждое сообщение. Без settings.single_process запись
+(или её отсутствие) перечитывается из базы не реже раза в
+CHAT_REGISTRY_REFRESH секунд.
+"""
+import logging
+import time
+
+from sqlalchemy import select
+
+from config import settings
+from database.engine import AsyncSessionLocal
+from database.models import Chat
+
+logger = logging.getLogger(__name__)
+
+
+class ChatRegistry:
+    """Кэш строк Chat по chat_id"""
+
+    def __init__(self, refresh_after: float | None = None):
+        self.refresh_after = refresh_after  # None — реестр меняет только этот процесс
+        self._chats: dict[int, Chat] = {}
+        self._checked: dict[int, float] = {}  # chat_id → когда запись сверяли с базой
+
+    async def load(self) -> None:
+        """Загружает все чаты из базы (при старте бота)"""
+        async with AsyncSessionLocal() as session:
+            result = await session.execute(select(Chat))
+            chats = result.scalars().all()
+        self._chats = {chat.chat_id: chat for chat in chats}
+        now = time.monotonic()
+        self._checked = {chat_id: now for chat_id in self._chats}
+        logger.info("Реестр чатов загружен: %d чатов", len(self._chats))
+
+    async def get(self, chat_id: int) -> Chat | None:
+        """Запись чата или None, если чат не настроен"""
+        if self.refresh_after is not None:
+            checked = self._checked.get(chat_id)
+            if checked is None or time.monotonic() - checked > self.refresh_after:
+                await self._refresh(chat_id)
+        return self._chats.get(chat_id)
+
+    async def chat_type(self, chat_id: int) -> str | None:
+        """Тип чата ('organizers' / 'participants') или None, если чат не настроен"""
+        chat = await self.get(chat_id)
+        return chat.chat_type if chat else None
+
+    async def _refresh(self, chat_id: int) -> None:
+        async with AsyncSessionLocal() as session:
+            result = await session.execute(select(Chat).where(Chat.chat_id == chat_id))
+            chat = result.scalar_one_or_none()
+        if chat is None:
+            self._chats.pop(chat_id, None)
+        else:
+            self._chats[chat_id] = chat
+        self._checked[chat_id] = time.monotonic()
+
+    def remember(self, chat: Chat) -> None:
+        """Обновляет запись после изменения в базе"""
+        self._chats[chat.chat_id] = chat
+        self._checked[chat.chat_id] = time.monotonic()
+
+
+chat_registry = ChatRegistry(
+    refresh_after=None if settings.single_process else settings.CHAT_REGISTRY_REFRESH
+)
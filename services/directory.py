@@ -0,0 +1,139 @@
+"""
+Справочник организаторов в памяти процесса.
+
+Таблица users целиком загружается в индекс, и команды !инфа, !фамилия и !адрес
+ищут по нему без похода в базу данных.
+"""
+import logging
+import random
+from dataclasses import dataclass
+
+from sqlalchemy import select
+
+from database.engine import AsyncSessionLocal
+from database.models import User
+
+logger = logging.getLogger(__name__)
+
+
+def normalize(text: str | None) -> str:
+    """Приводит строку к виду для поиска: нижний регистр, ё → е, одиночные пробелы"""
+    if not text:
+        return ""
+    return " ".join(text.casefold().replace("ё", "е").split())
+
+
+def _trigrams(text: str) -> set[str]:
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+@dataclass(frozen=True)
+class _Snapshot:
+    """Неизменяемый снимок справочника; заменяется целиком при перезагрузке"""
+    users: tuple[User, ...]
+    names: tuple[str, ...]  # нормализованные ФИО (по позициям users)
+    usernames: tuple[str, ...]  # нормализованные юзернеймы без @
+    name_trigrams: dict[str, frozenset[int]]
+    username_trigrams: dict[str, frozenset[int]]
+    by_username: dict[str, User]
+
+    @classmethod
+    def build(cls, users: list[User]) -> "_Snapshot":
+        users = sorted(users, key=lambda u: u.id)
+        names = tuple(normalize(u.full_name) for u in users)
+        usernames = tuple(normalize(u.telegram_username).lstrip("@") for u in users)
+
+        def index(values: tuple[str, ...]) -> dict[str, frozenset[int]]:
+            postings: dict[str, set[int]] = {}
+            for pos, value in enumerate(values):
+                for tri in _trigrams(value):
+                    postings.setdefault(tri, set()).add(pos)
+            return {tri: frozenset(ids) for tri, ids in postings.items()}
+
+        return cls(
+            users=tuple(users),
+            names=names,
+            usernames=usernames,
+            name_trigrams=index(names),
+            username_trigrams=index(usernames),
+            by_username={name: u for name, u in zip(usernames, users) if name},
+        )
+
+
+_EMPTY = _Snapshot.build([])
+
+
+class OrganizerDirectory:
+    """Индекс организаторов: поиск по подстроке ФИО и юзернейму"""
+
+    def __init__(self):
+        self._snapshot = _EMPTY
+        self.loaded = False
+        self.version = 0  # растёт при каждой перезагрузке — по нему сбрасываются зависимые кэши
+
+    def __len__(self) -> int:
+        return len(self._snapshot.users)
+
+    @property
+    def users(self) -> tuple[User, ...]:
+        return self._snapshot.users
+
+    async def reload(self) -> None:
+        """Перечитывает таблицу users и атомарно подменяет снимок"""
+        async with AsyncSessionLocal() as session:
+            result = await session.execute(select(User))
+            users = list(result.scalars().all())
+        self._snapshot = _Snapshot.build(users)
+        self.loaded = True
+        self.version += 1
+        logger.info("Справочник организаторов загружен: %d записей", len(users))
+
+    def random(self, rng: random.Random | None = None) -> User | None:
+        """Случайный организатор за O(1); None, если справочник пуст"""
+        users = self._snapshot.users
+        if not users:
+            return None
+        return users[(rng or random).randrange(len(users))]
+
+    def by_username(self, username: str) -> User | None:
+        """Точный поиск по telegram-юзернейму (регистр и @ не важны)"""
+        return self._snapshot.by_username.get(normalize(username).lstrip("@"))
+
+    def search(self, query: str, with_usernames: bool = False) -> list[User]:
+        """
+        Ищет организаторов, у которых ФИО (и юзернейм, если with_usernames)
+        содержит query. Совпадения с начала ФИО идут первыми.
+        """
+        snap = self._snapshot
+        needle = normalize(query)
+        if not needle:
+            return []
+
+        positions = self._match(needle, snap.names, snap.name_trigrams)
+        if with_usernames:
+            positions |= self._match(needle.lstrip("@"), snap.usernames, snap.username_trigrams)
+
+        ordered = sorted(positions, key=lambda pos: (not snap.names[pos].startswith(needle), pos))
+        return [snap.users[pos] for pos in ordered]
+
+    @staticmethod
+    def _match(needle: str, values: tuple[str, ...], postings: dict[str, frozenset[int]]) -> set[int]:
+        if not needle:
+            return set()
+        if len(needle) < 3:
+            # Для коротких запросов триграмм нет — справочник небольшой, проходим целиком
+            return {pos for pos, value in enumerate(values) if needle in value}
+
+        lists = []
+        for tri in _trigrams(needle):
+            ids = postings.get(tri)
+            if not ids:
+                return set()
+            lists.append(ids)
+        lists.sort(key=len)
+        candidates = set(lists[0]).intersection(*lists[1:])
+        # Триграммы дают надмножество — проверяем подстроку целиком
+        return {pos for pos in candidates if needle in values[pos]}
+
+
+directory = OrganizerDirectory()
@@ -0,0 +1,113 @@
+"""
+Фоновое отслеживание user_data.xlsx.
+
+Раз в USER_DATA_WATCH_INTERVAL секунд проверяется (mtime, size) файла. После
+изменения ждём, пока файл перестанет меняться USER_DATA_DEBOUNCE секунд
+(копирование или сохранение из Excel идёт несколькими записями), и запускаем
+инкрементальный импорт. Разбор файла идёт в отдельном потоке, а справочник
+организаторов подменяется целиком только после коммита.
+
+Импортирует только основной процесс (is_primary); остальные следят за
+import_state.imported_at и перечитывают справочник после чужого импорта
+(в том числе !перепарсить в другом воркере).
+"""
+import asyncio
+import logging
+import os
+from datetime import datetime
+from pathlib import Path
+
+from sqlalchemy import select
+
+from config import settings
+from database.engine import AsyncSessionLocal
+from database.models import ImportState
+from services.directory import directory
+
+logger = logging.getLogger(__name__)
+
+
+def _signature(path: str) -> tuple[float, int] | None:
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime, stat.st_size
+
+
+class ExcelWatcher:
+    """Перезагружает организаторов при изменении Excel файла"""
+
+    def __init__(self, path: str, interval: float, debounce: float):
+        self.path = path
+        self.interval = interval
+        self.debounce = debounce
+        self._seen: tuple[float, int] | None = None
+        self._imported_at: datetime | None = None
+
+    async def start(self, primary: bool = True) -> asyncio.Task:
+        """primary — этот процесс импортирует файл; остальные только перечитывают справочник"""
+        # Текущую версию файла загрузил entrypoint (или !перепарсить) — ждём следующую
+        self._seen = _signature(self.path)
+        self._imported_at = await self._last_import()
+        logger.info("Слежу за %s (каждые %s с)", self.path, self.interval)
+        return asyncio.create_task(self._run(primary))
+
+    async def _run(self, primary: bool) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                if primary:
+                    await self._check_file()
+                await self._check_import()
+            except Exception:
+                logger.exception("Не удалось перезагрузить %s", self.path)
+
+    async def _check_file(self) -> None:
+        current = _signature(self.path)
+        if current is None or current == self._seen:
+            return
+
+        # Debounce: ждём, пока файл допишут
+        while True:
+            await asyncio.sleep(self.debounce)
+            settled = _signature(self.path)
+            if settled == current:
+                break
+            current = settled
+        if current is None:
+            return
+
+        self._seen = current
+        # Импорт здесь, чтобы не тянуть openpyxl при импорте services
+        from utils import load_users_from_excel
+
+        summary = await load_users_from_excel(self.path)
+        # Справочник уже перезагружен импортом — свою запись в import_state не повторяем
+        self._imported_at = await self._last_import()
+        if summary is not None:
+            logger.info(
+                "%s перезагружен: +%d ~%d -%d",
+                self.path, len(summary.added), len(summary.updated), len(summary.deleted)
+            )
+
+    async def _check_import(self) -> None:
+        imported_at = await self._last_import()
+        if imported_at != self._imported_at:
+            self._imported_at = imported_at
+            await directory.reload()
+
+    async def _last_import(self) -> datetime | None:
+        async with AsyncSessionLocal() as session:
+            result = await session.execute(
+                select(ImportState.imported_at)
+                .where(ImportState.source == str(Path(self.path).resolve()))
+            )
+            return result.scalar_one_or_none()
+
+
+excel_watcher = ExcelWatcher(
+    path=settings.USER_DATA_FILE,
+    interval=settings.USER_DATA_WATCH_INTERVAL,
+    debounce=settings.USER_DATA_DEBOUNCE,
+)
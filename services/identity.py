@@ -0,0 +1,110 @@
+"""
+Кто из организаторов стоит за Telegram-аккаунтом.
+
+Раньше !пиво на каждый вызов искало пользователя через ILIKE '%…%' по
+юзернейму и ФИО (плюс второй запрос по фамилии) — два скана таблицы без
+индекса. Теперь результат берётся из кэша по telegram id; при промахе —
+точный запрос по индексу users.telegram_id. Если id ещё не известен, но
+юзернейм точно совпал с записью в справочнике, telegram_id записывается в
+базу, и дальше поиск точный. Совпадение только по ФИО (как раньше ILIKE)
+даёт ответ на этот раз, но не кэшируется и ни к чему не привязывает.
+"""
+import logging
+from dataclasses import dataclass
+
+from aiogram.types import User as TelegramUser
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config import settings
+from database.models import User
+from services.cache import TTLCache
+from services.directory import directory
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class Identity:
+    """Организатор за аккаунтом (user_id=None — не найден) и его права"""
+    user_id: int | None
+    is_tp: bool = False
+
+    @classmethod
+    def of(cls, user: User | None) -> "Identity":
+        if user is None:
+            return _UNKNOWN
+        return cls(user_id=user.id, is_tp="ТП" in (user.department or "").upper())
+
+
+_UNKNOWN = Identity(user_id=None)
+
+
+class IdentityResolver:
+    """Кэш «telegram id → Identity», сбрасывается при перезагрузке справочника"""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self._cache: TTLCache[int, Identity] = TTLCache(maxsize, ttl)
+        self._version = directory.version
+
+    async def resolve(self, session: AsyncSession, tg_user: TelegramUser) -> Identity:
+        if self._version != directory.version:
+            # Excel перезагружен — подразделения могли поменяться
+            self._cache = TTLCache(self._cache.maxsize, self._cache.ttl)
+            self._version = directory.version
+
+        identity = self._cache.get(tg_user.id)
+        if identity is not None:
+            return identity
+
+        user = await self._by_telegram_id(session, tg_user.id)
+        if user is None:
+            user = await self._bind_by_username(session, tg_user)
+        if user is None:
+            # Совпадение по ФИО ненадёжно: отвечаем по нему, но не кэшируем и не привязываем
+            return Identity.of(self._match_full_name(tg_user))
+
+        identity = Identity.of(user)
+        self._cache.set(tg_user.id, identity)
+        return identity
+
+    @staticmethod
+    async def _by_telegram_id(session: AsyncSession, telegram_id: int) -> User | None:
+        result = await session.execute(
+            select(User).where(User.telegram_id == telegram_id).order_by(User.id).limit(1)
+        )
+        return result.scalar_one_or_none()
+
+    async def _bind_by_username(self, session: AsyncSession, tg_user: TelegramUser) -> User | None:
+        """Точное совпадение юзернейма: запоминаем telegram_id, чтобы дальше искать по индексу"""
+        if not tg_user.username:
+            return None
+        user = directory.by_username(tg_user.username)
+        # Запись с другим telegram_id принадлежит другому аккаунту: свой нашёлся бы по индексу
+        if user is None or user.telegram_id is not None:
+            return None
+
+        result = await session.execute(
+            update(User)
+            .where(User.id == user.id, User.telegram_id.is_(None))
+            .values(telegram_id=tg_user.id)
+        )
+        if result.rowcount != 1:
+            # Справочник устарел: строку уже привязали (возможно, параллельный апдейт этого же аккаунта)
+            return await self._by_telegram_id(session, tg_user.id)
+        logger.info("Организатор %s привязан к telegram id %s", user.full_name, tg_user.id)
+        return user
+
+    @staticmethod
+    def _match_full_name(tg_user: TelegramUser) -> User | None:
+        """Единственный организатор без привязки, чьё ФИО содержит имя из Telegram"""
+        if not tg_user.full_name:
+            return None
+        users = [u for u in directory.search(tg_user.full_name) if u.telegram_id is None]
+        return users[0] if len(users) == 1 else None
+
+
+identity_resolver = IdentityResolver(
+    maxsize=settings.IDENTITY_CACHE_SIZE,
+    ttl=settings.IDENTITY_CACHE_TTL,
+)
@@ -0,0 +1,105 @@
+"""
+Топ !статистика по чатам.
+
+Для каждого чата, у которого хоть раз спросили статистику, в памяти лежит
+список (-count, user_id), отсортированный bisect'ом: наливание сдвигает одну
+запись, топ-N — срез списка. Без settings.single_process топ читается из
+базы: ORDER BY count DESC LIMIT N по индексу (chat_id, count).
+"""
+import asyncio
+from bisect import bisect_left, insort
+
+from sqlalchemy import select
+
+from config import settings
+from database.engine import AsyncSessionLocal
+from database.models import BeerStat
+from services.write_behind import write_behind
+
+
+class _ChatBoard:
+    def __init__(self):
+        self.counts: dict[int, int] = {}
+        self.names: dict[int, str | None] = {}
+        self.order: list[tuple[int, int]] = []  # (-count, user_id)
+
+    def add(self, user_id: int, username: str | None, amount: int) -> None:
+        old = self.counts.get(user_id)
+        if old is not None:
+            del self.order[bisect_left(self.order, (-old, user_id))]
+        count = (old or 0) + amount
+        self.counts[user_id] = count
+        if username or user_id not in self.names:
+            self.names[user_id] = username
+        insort(self.order, (-count, user_id))
+
+    def top(self, limit: int) -> list[tuple[int, str | None, int]]:
+        return [(user_id, self.names[user_id], -count) for count, user_id in self.order[:limit]]
+
+
+class BeerLeaderboard:
+    """Топ наливаний по чатам: из памяти для одного процесса, иначе из базы"""
+
+    def __init__(self, use_cache: bool):
+        self.use_cache = use_cache
+        self._boards: dict[int, _ChatBoard] = {}
+        self._loads: dict[int, asyncio.Task] = {}
+
+    def record(self, chat_id: int, user_id: int, username: str | None, amount: int = 1) -> None:
+        """Учитывает наливание: буфер записи в базу и топ чата, если он загружен"""
+        write_behind.add_beer(chat_id, user_id, username, amount)
+        board = self._boards.get(chat_id)
+        if board is not None:
+            board.add(user_id, username, amount)
+
+    async def top(self, chat_id: int, limit: int) -> list[tuple[int, str | None, int]]:
+        """Топ-limit чата: (user_id, username, count) по убыванию count"""
+        board = self._boards.get(chat_id)
+        if board is not None:
+            return board.top(limit)
+
+        if not self.use_cache:
+            async with write_behind.flushed():
+                return await self._top_from_db(chat_id, limit)
+
+        # Одна загрузка на чат: остальные запросы топа ждут её, а не видят пустой список
+        load = self._loads.get(chat_id)
+        if load is None:
+            load = self._loads[chat_id] = asyncio.create_task(self._load(chat_id))
+        board = await asyncio.shield(load)
+        return board.top(limit)
+
+    async def _load(self, chat_id: int) -> _ChatBoard:
+        try:
+            async with write_behind.flushed():
+                async with AsyncSessionLocal() as session:
+                    result = await session.execute(
+                        select(BeerStat.user_id, BeerStat.username, BeerStat.count)
+                        .where(BeerStat.chat_id == chat_id)
+                    )
+                    rows = result.all()
+                # Наливания, пришедшие во время сброса и SELECT, лежат в буфере, а не в базе.
+                # Дальше до публикации нет await, поэтому ни одно не потеряется и не задвоится
+                board = _ChatBoard()
+                for user_id, username, count in (*rows, *write_behind.pending_beer(chat_id)):
+                    board.add(user_id, username, count)
+                # Публикуем только полностью загруженный топ; при ошибке следующий запрос повторит
+                self._boards[chat_id] = board
+            return board
+        finally:
+            self._loads.pop(chat_id, None)
+
+    async def _top_from_db(self, chat_id: int, limit: int) -> list[tuple[int, str | None, int]]:
+        async with AsyncSessionLocal() as session:
+            result = await session.execute(
+                select(BeerStat.user_id, BeerStat.username, BeerStat.count)
+                .where(BeerStat.chat_id == chat_id)
+                .order_by(BeerStat.count.desc(), BeerStat.user_id)
+                .limit(limit)
+            )
+            return [tuple(row) for row in result.all()]
+
+
+beer_leaderboard = BeerLeaderboard(
+    use_cache=settings.single_process
+)
@@ -0,0 +1,120 @@
+"""
+Индекс активных математических дуэлей в памяти.
+
+handle_math_duel_answer срабатывает на любое сообщение из одних цифр; индекс
+(chat_id, user_id) → дуэли служит фильтром aiogram, поэтому числа в чатах без
+дуэли не доходят ни до хендлера, ни до базы. Без settings.single_process
+фильтр пропускает всё, и проверку делает база.
+
+Дуэль живёт MATH_DUEL_TIMEOUT секунд: просроченные забываются индексом сразу,
+а в базе их пачкой помечает expired фоновая задача.
+"""
+import asyncio
+import heapq
+import logging
+from datetime import datetime, timedelta
+
+from aiogram.types import Message
+from sqlalchemy import select, update
+
+from config import settings
+from database.engine import AsyncSessionLocal
+from database.models import MathDuel
+
+logger = logging.getLogger(__name__)
+
+
+class MathDuelIndex:
+    """(chat_id, user_id) → id активных дуэлей игрока"""
+
+    def __init__(self, enabled: bool, timeout: float, sweep_interval: float):
+        self.enabled = enabled
+        self.timeout = timedelta(seconds=timeout)
+        self.sweep_interval = sweep_interval
+        self._players: dict[tuple[int, int], set[int]] = {}
+        self._duels: dict[int, tuple[int, int, int]] = {}  # id → (chat_id, user1_id, user2_id)
+        self._deadlines: list[tuple[datetime, int]] = []  # min-куча (истекает, id)
+
+    def cutoff(self) -> datetime:
+        """Дуэли, созданные раньше этого момента, считаются просроченными"""
+        return datetime.utcnow() - self.timeout
+
+    async def load(self) -> None:
+        """Загружает незавершённые дуэли из базы (при старте бота)"""
+        async with AsyncSessionLocal() as session:
+            result = await session.execute(
+                select(MathDuel.id, MathDuel.chat_id, MathDuel.user1_id, MathDuel.user2_id, MathDuel.created_at)
+                .where(MathDuel.expired == False, MathDuel.created_at > self.cutoff())
+            )
+            rows = result.all()
+        self._players = {}
+        self._duels = {}
+        self._deadlines = []
+        for row in rows:
+            self._add(*row)
+        logger.info("Индекс матдуэлей загружен: %d активных", len(rows))
+
+    def add(self, duel: MathDuel) -> None:
+        self._add(duel.id, duel.chat_id, duel.user1_id, duel.user2_id, duel.created_at)
+
+    def _add(self, duel_id: int, chat_id: int, user1_id: int, user2_id: int, created_at: datetime) -> None:
+        self._duels[duel_id] = (chat_id, user1_id, user2_id)
+        for user_id in (user1_id, user2_id):
+            self._players.setdefault((chat_id, user_id), set()).add(duel_id)
+        heapq.heappush(self._deadlines, (created_at + self.timeout, duel_id))
+
+    def remove(self, duel_id: int) -> None:
+        duel = self._duels.pop(duel_id, None)
+        if duel is None:
+            return
+        chat_id, user1_id, user2_id = duel
+        for user_id in (user1_id, user2_id):
+            duels = self._players.get((chat_id, user_id))
+            if duels is not None:
+                duels.discard(duel_id)
+                if not duels:
+                    del self._players[(chat_id, user_id)]
+
+    def has_active(self, chat_id: int, user_id: int) -> bool:
+        self._expire()
+        return (chat_id, user_id) in self._players
+
+    def _expire(self) -> None:
+        now = datetime.utcnow()
+        while self._deadlines and self._deadlines[0][0] <= now:
+            _, duel_id = heapq.heappop(self._deadlines)
+            self.remove(duel_id)
+
+    def start(self) -> asyncio.Task:
+        return asyncio.create_task(self._sweep())
+
+    async def _sweep(self) -> None:
+        """Раз в sweep_interval помечает просроченные дуэли одним UPDATE"""
+        while True:
+            try:
+                async with AsyncSessionLocal() as session:
+                    result = await session.execute(
+                        update(MathDuel)
+                        .where(MathDuel.expired == False, MathDuel.created_at <= self.cutoff())
+                        .values(expired=True)
+                    )
+                    await session.commit()
+                if result.rowcount:
+                    logger.info("Просрочено матдуэлей: %d", result.rowcount)
+                self._expire()
+            except Exception:
+                logger.exception("Не удалось просрочить матдуэли")
+            await asyncio.sleep(self.sweep_interval)
+
+    def __call__(self, message: Message) -> bool:
+        """Фильтр aiogram: у автора сообщения есть активная дуэль в этом чате"""
+        if not self.enabled:
+            return True
+        return message.from_user is not None and self.has_active(message.chat.id, message.from_user.id)
+
+
+math_duels = MathDuelIndex(
+    enabled=settings.single_process,
+    timeout=settings.MATH_DUEL_TIMEOUT,
+    sweep_interval=settings.MATH_DUEL_SWEEP_INTERVAL,
+)
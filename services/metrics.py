@@ -0,0 +1,168 @@
+"""
+Метрики бота в формате Prometheus.
+
+Для каждого хендлера считаются вызовы, ошибки, гистограмма длительности, а
+также время и число запросов к базе и к Telegram Bot API внутри него. Хендлер
+текущего апдейта хранится в ContextVar: его выставляет MetricsMiddleware, а
+события SQLAlchemy и request-middleware бота добавляют туда своё время.
+Всё, что выполняется вне хендлеров (побудки, сброс буфера), попадает под
+handler="background".
+"""
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from contextvars import ContextVar
+from dataclasses import dataclass
+
+from aiogram import Bot
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.methods import Response, TelegramMethod
+from aiohttp import web
+from sqlalchemy import event
+
+from database.engine import engine
+from services.outbound import outbound
+
+BACKGROUND = "background"
+
+# Границы корзин гистограммы длительности хендлера, секунды
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+@dataclass
+class HandlerStats:
+    calls: int = 0
+    errors: int = 0
+    duration_sum: float = 0.0
+    db_queries: int = 0
+    db_seconds: float = 0.0
+    telegram_requests: int = 0
+    telegram_seconds: float = 0.0
+
+    def __post_init__(self):
+        self.buckets = [0] * (len(DURATION_BUCKETS) + 1)  # последняя — +Inf
+
+    def observe(self, seconds: float) -> None:
+        self.duration_sum += seconds
+        self.buckets[bisect_left(DURATION_BUCKETS, seconds)] += 1
+
+
+_current: ContextVar[str] = ContextVar("metrics_handler", default=BACKGROUND)
+
+
+class MetricsRegistry:
+    """Счётчики по хендлерам и выдача их в текстовом формате Prometheus"""
+
+    def __init__(self):
+        self.handlers: defaultdict[str, HandlerStats] = defaultdict(HandlerStats)
+
+    def enter(self, handler: str):
+        """Делает handler текущим для учёта времени БД и Telegram; возвращает токен"""
+        return _current.set(handler)
+
+    def exit(self, token) -> None:
+        _current.reset(token)
+
+    def current(self) -> HandlerStats:
+        return self.handlers[_current.get()]
+
+    def render(self) -> str:
+        lines = []
+
+        def family(name: str, kind: str, help_text: str):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        stats = sorted(self.handlers.items())
+        simple = [
+            ("bot_handler_calls_total", "counter", "Вызовы хендлера", "calls"),
+            ("bot_handler_errors_total", "counter", "Исключения в хендлере", "errors"),
+            ("bot_handler_db_queries_total", "counter", "SQL-запросы из хендлера", "db_queries"),
+            ("bot_handler_db_seconds_total", "counter", "Время SQL-запросов", "db_seconds"),
+            ("bot_handler_telegram_requests_total", "counter", "Запросы к Bot API", "telegram_requests"),
+            ("bot_handler_telegram_seconds_total", "counter", "Время запросов к Bot API", "telegram_seconds"),
+        ]
+        for name, kind, help_text, attr in simple:
+            family(name, kind, help_text)
+            for handler, s in stats:
+                lines.append(f'{name}{{handler="{handler}"}} {getattr(s, attr)}')
+
+        family("bot_handler_duration_seconds", "histogram", "Длительность хендлера")
+        for handler, s in stats:
+            if not s.calls:
+                continue
+            cumulative = 0
+            for bound, count in zip((*DURATION_BUCKETS, "+Inf"), s.buckets):
+                cumulative += count
+                lines.append(f'bot_handler_duration_seconds_bucket{{handler="{handler}",le="{bound}"}} {cumulative}')
+            lines.append(f'bot_handler_duration_seconds_sum{{handler="{handler}"}} {s.duration_sum}')
+            lines.append(f'bot_handler_duration_seconds_count{{handler="{handler}"}} {s.calls}')
+
+        family("bot_outbound_queue_depth", "gauge", "Запросы в очереди исходящих")
+        lines.append(f"bot_outbound_queue_depth {outbound.queue_depth}")
+        family("bot_outbound_events_total", "counter", "События диспетчера исходящих")
+        for key, value in sorted(outbound.metrics.items()):
+            lines.append(f'bot_outbound_events_total{{event="{key}"}} {value}')
+
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+
+
+# --- SQLAlchemy: время каждого запроса относится к текущему хендлеру ---
+
+@event.listens_for(engine.sync_engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("metrics_started", []).append(time.perf_counter())
+
+
+@event.listens_for(engine.sync_engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info["metrics_started"].pop()
+    stats = metrics.current()
+    stats.db_queries += 1
+    stats.db_seconds += time.perf_counter() - started
+
+
+@event.listens_for(engine.sync_engine, "handle_error")
+def _handle_error(exception_context):
+    # Упавший запрос не дойдёт до after_cursor_execute — снимаем отметку
+    conn = exception_context.connection
+    if conn is not None and conn.info.get("metrics_started"):
+        conn.info["metrics_started"].pop()
+
+
+class TelegramTimer(BaseRequestMiddleware):
+    """Request-middleware бота: время каждого запроса к Bot API"""
+
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType,
+        bot: Bot,
+        method: TelegramMethod,
+    ) -> Response:
+        started = time.perf_counter()
+        try:
+            return await make_request(bot, method)
+        finally:
+            stats = metrics.current()
+            stats.telegram_requests += 1
+            stats.telegram_seconds += time.perf_counter() - started
+
+
+telegram_timer = TelegramTimer()
+
+
+async def _metrics_view(request: web.Request) -> web.Response:
+    return web.Response(text=metrics.render(), content_type="text/plain", charset="utf-8")
+
+
+async def start_metrics_server(host: str, port: int) -> web.AppRunner:
+    """Поднимает HTTP-сервер с GET /metrics; вернуть runner, чтобы остановить его"""
+    app = web.Application()
+    app.router.add_get("/metrics", _metrics_view)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner
@@ -0,0 +1,121 @@
+"""
+Модерация: выдача мутов с учётом в таблице mutes и массовый размут.
+
+Бот записывает каждый свой мут в базу и в журнал mute_ledger, поэтому !анмут
+снимает ограничения только с тех, кто действительно в муте, а не опрашивает
+get_chat_member по всем известным пользователям.
+"""
+import asyncio
+import logging
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Awaitable, Callable, Iterable
+
+from aiogram import Bot
+from aiogram.types import ChatPermissions
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config import settings
+from database.engine import after_commit
+from database.models import Mute
+from services.mutes import mute_ledger
+
+logger = logging.getLogger(__name__)
+
+MUTED_PERMISSIONS = ChatPermissions(can_send_messages=False)
+
+FULL_PERMISSIONS = ChatPermissions(
+    can_send_messages=True,
+    can_send_audios=True,
+    can_send_documents=True,
+    can_send_photos=True,
+    can_send_videos=True,
+    can_send_video_notes=True,
+    can_send_voice_notes=True,
+    can_send_polls=True,
+    can_send_other_messages=True,
+    can_add_web_page_previews=True,
+    can_change_info=True,
+    can_invite_users=True,
+    can_pin_messages=True
+)
+
+
+@dataclass
+class BulkResult:
+    succeeded: list
+    failed: list
+
+
+class BulkModerationExecutor:
+    """
+    Выполняет пачку вызовов Telegram API с ограниченным параллелизмом.
+    Паузы и повторы при флуд-контроле делает services.outbound — здесь
+    вызов, который не прошёл и после них, считается неудачным.
+    """
+
+    def __init__(self, concurrency: int):
+        self.concurrency = concurrency
+
+    async def run(self, calls: Iterable[tuple[object, Callable[[], Awaitable]]]) -> BulkResult:
+        """
+        calls — пары (ключ, фабрика корутины). Возвращает ключи успешных и
+        неудачных вызовов.
+        """
+        semaphore = asyncio.Semaphore(self.concurrency)
+        result = BulkResult(succeeded=[], failed=[])
+
+        async def worker(key, call):
+            async with semaphore:
+                try:
+                    await call()
+                except Exception as e:
+                    logger.warning("Ошибка модерации для %s: %s", key, e)
+                    result.failed.append(key)
+                else:
+                    result.succeeded.append(key)
+
+        await asyncio.gather(*(worker(key, call) for key, call in calls))
+        return result
+
+
+bulk_executor = BulkModerationExecutor(concurrency=settings.MODERATION_CONCURRENCY)
+
+
+async def mute_user(session: AsyncSession, bot: Bot, chat_id: int, user_id: int,
+                    until: datetime, reason: str) -> None:
+    """Мьютит пользователя до until и добавляет мут в транзакцию апдейта"""
+    await bot.restrict_chat_member(
+        chat_id=chat_id,
+        user_id=user_id,
+        permissions=MUTED_PERMISSIONS,
+        until_date=until
+    )
+    session.add(Mute(chat_id=chat_id, user_id=user_id, until=until, reason=reason))
+    after_commit(session, lambda: mute_ledger.add(chat_id, user_id, until))
+
+
+async def unmute_tracked(session: AsyncSession, bot: Bot, chat_id: int) -> int:
+    """Снимает все действующие муты бота в чате. Возвращает число размученных"""
+    user_ids = list(await mute_ledger.active(session, chat_id))
+    if not user_ids:
+        return 0
+
+    outcome = await bulk_executor.run(
+        (user_id, lambda user_id=user_id: bot.restrict_chat_member(
+            chat_id=chat_id, user_id=user_id, permissions=FULL_PERMISSIONS
+        ))
+        for user_id in user_ids
+    )
+
+    if outcome.succeeded:
+        # Закрываем муты, которые сняли досрочно
+        now = datetime.utcnow()
+        await session.execute(
+            update(Mute)
+            .where(Mute.chat_id == chat_id, Mute.user_id.in_(outcome.succeeded), Mute.until > now)
+            .values(until=now)
+        )
+        after_commit(session, lambda: mute_ledger.lift(chat_id, outcome.succeeded))
+    return len(outcome.succeeded)
@@ -0,0 +1,89 @@
+"""
+Журнал действующих мутов в памяти.
+
+Хранит муты, выданные ботом, и сам забывает истёкшие, так что ответ на вопрос
+«кто сейчас в муте» не требует ни запросов к базе, ни get_chat_member. Без
+settings.single_process действующие муты читаются из базы по индексу
+(chat_id, until).
+"""
+import heapq
+import logging
+from datetime import datetime
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config import settings
+from database.engine import AsyncSessionLocal
+from database.models import Mute
+
+logger = logging.getLogger(__name__)
+
+
+class MuteLedger:
+    """chat_id → {user_id: until}; истёкшие записи вычищаются по min-куче"""
+
+    def __init__(self, use_cache: bool):
+        self.use_cache = use_cache
+        self._chats: dict[int, dict[int, datetime]] = {}
+        self._expiry: list[tuple[datetime, int, int]] = []
+
+    async def load(self) -> None:
+        """Загружает действующие муты из базы (при старте бота)"""
+        now = datetime.utcnow()
+        async with AsyncSessionLocal() as session:
+            result = await session.execute(
+                select(Mute.chat_id, Mute.user_id, Mute.until).where(Mute.until > now)
+            )
+            rows = result.all()
+        self._chats = {}
+        self._expiry = []
+        for chat_id, user_id, until in rows:
+            self.add(chat_id, user_id, until)
+        logger.info("Журнал мутов загружен: %d действующих", len(rows))
+
+    def add(self, chat_id: int, user_id: int, until: datetime) -> None:
+        users = self._chats.setdefault(chat_id, {})
+        if until > users.get(user_id, datetime.min):
+            users[user_id] = until
+            heapq.heappush(self._expiry, (until, chat_id, user_id))
+
+    def lift(self, chat_id: int, user_ids) -> None:
+        """Убирает муты, снятые досрочно"""
+        users = self._chats.get(chat_id, {})
+        for user_id in user_ids:
+            users.pop(user_id, None)
+
+    async def active(self, session: AsyncSession, chat_id: int) -> dict[int, datetime]:
+        """Действующие муты в чате: {user_id: until}"""
+        if not self.use_cache:
+            result = await session.execute(
+                select(Mute.user_id, Mute.until)
+                .where(Mute.chat_id == chat_id, Mute.until > datetime.utcnow())
+            )
+            active: dict[int, datetime] = {}
+            for user_id, until in result.all():
+                active[user_id] = max(until, active.get(user_id, until))
+            return active
+        self._expire()
+        return dict(self._chats.get(chat_id, {}))
+
+    def is_muted(self, chat_id: int, user_id: int) -> bool:
+        self._expire()
+        return user_id in self._chats.get(chat_id, {})
+
+    def _expire(self) -> None:
+        now = datetime.utcnow()
+        while self._expiry and self._expiry[0][0] <= now:
+            until, chat_id, user_id = heapq.heappop(self._expiry)
+            users = self._chats.get(chat_id)
+            # Запись могла быть продлена более поздним мутом или уже снята
+            if users is not None and users.get(user_id) == until:
+                del users[user_id]
+                if not users:
+                    del self._chats[chat_id]
+
+
+mute_ledger = MuteLedger(
+    use_cache=settings.single_process
+)
@@ -0,0 +1,63 @@
+"""
+Случайный организатор для !кто и !орг дня.
+
+Выбор идёт по массиву справочника за O(1). Если справочник ещё не загружен,
+из базы читается ровно одна строка: COUNT(*) и OFFSET случайного номера.
+Организатор дня может быть детерминированным: выбор зависит только от чата
+и даты (UTC) и кэшируется до конца дня.
+"""
+import random
+from datetime import date, datetime, timezone
+
+from sqlalchemy import func, select
+
+from config import settings
+from database.engine import AsyncSessionLocal
+from database.models import User
+from services.directory import directory
+
+
+async def _sample_from_db(rng: random.Random | None = None) -> User | None:
+    # Порядок по id тот же, что в справочнике: с одним rng выбор совпадёт с directory.random
+    async with AsyncSessionLocal() as session:
+        total = await session.scalar(select(func.count()).select_from(User))
+        if not total:
+            return None
+        result = await session.execute(
+            select(User).order_by(User.id).offset((rng or random).randrange(total)).limit(1)
+        )
+        return result.scalar_one_or_none()
+
+
+async def random_organizer() -> User | None:
+    """Случайный организатор без загрузки всей таблицы"""
+    if directory.loaded:
+        return directory.random()
+    return await _sample_from_db()
+
+
+class OrgOfDay:
+    """Организатор дня: случайный на каждый вызов или один на (чат, дата)"""
+
+    def __init__(self, deterministic: bool):
+        self.deterministic = deterministic
+        self._picked: dict[int, tuple[date, User]] = {}
+
+    async def pick(self, chat_id: int, day: date | None = None) -> User | None:
+        if not self.deterministic:
+            return await random_organizer()
+
+        day = day or datetime.now(timezone.utc).date()
+        cached = self._picked.get(chat_id)
+        if cached is not None and cached[0] == day:
+            return cached[1]
+
+        # Сид зависит только от чата и даты, поэтому все воркеры выберут одного и того же
+        rng = random.Random(f"{chat_id}:{day.isoformat()}")
+        user = directory.random(rng) if directory.loaded else await _sample_from_db(rng)
+        if user is not None:
+            self._picked[chat_id] = (day, user)
+        return user
+
+
+org_of_day = OrgOfDay(deterministic=settings.ORG_OF_DAY_DETERMINISTIC)
@@ -0,0 +1,223 @@
+"""
+Центральный диспетчер исходящих запросов к Telegram.
+
+Подключается как request-middleware к сессии бота, поэтому через него проходят
+все отправки: message.answer, bot.send_message, restrict_chat_member и т.д.
+Отправки ограничиваются глобальным и поканальным token bucket, TelegramRetryAfter
+обрабатывается паузой и повтором, а очередь разбита на приоритеты: ответы на
+команды обгоняют массовые рассылки.
+"""
+import asyncio
+import itertools
+import logging
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from enum import IntEnum
+
+from aiogram import Bot
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import Response, TelegramMethod
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+# Методы, на которые распространяется глобальный лимит
+_THROTTLED_PREFIXES = ("Send", "Forward", "Copy", "Edit", "Restrict")
+# Методы, которые публикуют сообщения и подчиняются лимиту на чат
+_CHAT_LIMITED_PREFIXES = ("Send", "Forward", "Copy")
+# Как часто выбрасывать вёдра чатов, которые успели наполниться (сек)
+_EVICT_INTERVAL = 60
+
+
+class Priority(IntEnum):
+    INTERACTIVE = 0  # ответы на команды
+    NORMAL = 1  # фоновые уведомления (побудки)
+    BULK = 2  # массовые упоминания, размут всех
+
+
+_lane: ContextVar[Priority] = ContextVar("outbound_lane", default=Priority.INTERACTIVE)
+
+
+class TokenBucket:
+    """Классический token bucket: rate токенов в секунду, не больше capacity"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        if now > self.updated:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+    def delay(self, now: float) -> float:
+        """Через сколько секунд будет доступен токен (0 — уже доступен)"""
+        self._refill(now)
+        if now < self.updated:  # пауза после RetryAfter
+            return self.updated - now
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def take(self) -> None:
+        self.tokens -= 1
+
+    def is_full(self, now: float) -> bool:
+        """Полное ведро без паузы ничем не отличается от нового"""
+        self._refill(now)
+        return now >= self.updated and self.tokens >= self.capacity
+
+    def pause(self, seconds: float) -> None:
+        """Опустошает ведро и запрещает отправку на seconds секунд"""
+        self.tokens = 0
+        self.updated = max(self.updated, time.monotonic() + seconds)
+
+
+@dataclass(order=True)
+class _Waiter:
+    priority: int
+    seq: int
+    chat_id: int | str | None = field(compare=False)
+    future: asyncio.Future = field(compare=False)
+    queued_at: float = field(compare=False)
+
+
+class OutboundDispatcher(BaseRequestMiddleware):
+    """Очередь исходящих запросов с приоритетами и token bucket"""
+
+    def __init__(self, global_rate: float, private_rate: float, group_rate_per_minute: float,
+                 chat_burst: int, max_retries: int):
+        self._global = TokenBucket(global_rate, global_rate)
+        self._private_rate = private_rate
+        self._group_rate = group_rate_per_minute / 60
+        self._chat_burst = chat_burst
+        self._max_retries = max_retries
+        self._chats: dict[int | str, TokenBucket] = {}
+        self._evicted_at = time.monotonic()
+        self._waiting: list[_Waiter] = []
+        self._seq = itertools.count()
+        self._changed = asyncio.Event()
+        self._pump_task: asyncio.Task | None = None
+        self.metrics: Counter[str] = Counter()
+
+    @contextmanager
+    def lane(self, priority: Priority):
+        """Все запросы внутри блока идут с указанным приоритетом"""
+        token = _lane.set(priority)
+        try:
+            yield
+        finally:
+            _lane.reset(token)
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._waiting)
+
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType,
+        bot: Bot,
+        method: TelegramMethod,
+    ) -> Response:
+        if not type(method).__name__.startswith(_THROTTLED_PREFIXES):
+            return await make_request(bot, method)
+
+        chat_id = getattr(method, "chat_id", None)
+        if not type(method).__name__.startswith(_CHAT_LIMITED_PREFIXES):
+            chat_id = None
+        priority = _lane.get()
+        for attempt in range(self._max_retries + 1):
+            await self._acquire(chat_id, priority)
+            try:
+                response = await make_request(bot, method)
+            except TelegramRetryAfter as e:
+                self.metrics["retry_after"] += 1
+                if attempt == self._max_retries:
+                    self.metrics["failed"] += 1
+                    raise
+                logger.warning("Flood control (%s, чат %s): пауза %s с", type(method).__name__, chat_id, e.retry_after)
+                bucket = self._chat_bucket(chat_id) if chat_id is not None else self._global
+                bucket.pause(e.retry_after)
+                continue
+            self.metrics[f"sent_{priority.name.lower()}"] += 1
+            return response
+
+    def _chat_bucket(self, chat_id: int | str) -> TokenBucket:
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            self._evict_full()
+            # Отрицательные id — группы и каналы, у них лимит в сообщениях в минуту
+            is_group = isinstance(chat_id, str) or chat_id < 0
+            rate = self._group_rate if is_group else self._private_rate
+            bucket = self._chats[chat_id] = TokenBucket(rate, self._chat_burst)
+        return bucket
+
+    def _evict_full(self) -> None:
+        # Иначе словарь растёт на каждый чат, куда бот хоть раз писал
+        now = time.monotonic()
+        if now - self._evicted_at < _EVICT_INTERVAL:
+            return
+        self._evicted_at = now
+        self._chats = {chat_id: b for chat_id, b in self._chats.items() if not b.is_full(now)}
+
+    async def _acquire(self, chat_id: int | str | None, priority: Priority) -> None:
+        if self._pump_task is None or self._pump_task.done():
+            self._pump_task = asyncio.create_task(self._pump())
+
+        waiter = _Waiter(priority, next(self._seq), chat_id, asyncio.get_running_loop().create_future(),
+                         time.monotonic())
+        self._waiting.append(waiter)
+        self._changed.set()
+        await waiter.future
+
+        waited = time.monotonic() - waiter.queued_at
+        self.metrics["wait_ms_total"] += int(waited * 1000)
+        self.metrics["wait_ms_max"] = max(self.metrics["wait_ms_max"], int(waited * 1000))
+
+    async def _pump(self) -> None:
+        """Выдаёт разрешения на отправку ожидающим в порядке приоритета"""
+        while True:
+            self._changed.clear()
+            self._waiting = [w for w in self._waiting if not w.future.done()]
+            if not self._waiting:
+                await self._changed.wait()
+                continue
+
+            now = time.monotonic()
+            sleep_for = self._global.delay(now)
+            if sleep_for == 0:
+                sleep_for = float("inf")
+                for waiter in sorted(self._waiting):
+                    bucket = self._chat_bucket(waiter.chat_id) if waiter.chat_id is not None else None
+                    delay = bucket.delay(now) if bucket else 0.0
+                    if delay == 0:
+                        self._global.take()
+                        if bucket:
+                            bucket.take()
+                        self._waiting.remove(waiter)
+                        waiter.future.set_result(None)
+                        sleep_for = 0
+                        break
+                    sleep_for = min(sleep_for, delay)
+
+            if sleep_for:
+                try:
+                    await asyncio.wait_for(self._changed.wait(), sleep_for)
+                except asyncio.TimeoutError:
+                    pass
+
+
+outbound = OutboundDispatcher(
+    global_rate=settings.OUTBOUND_GLOBAL_RATE,
+    private_rate=settings.OUTBOUND_PRIVATE_RATE,
+    group_rate_per_minute=settings.OUTBOUND_GROUP_RATE_PER_MINUTE,
+    chat_burst=settings.OUTBOUND_CHAT_BURST,
+    max_retries=settings.OUTBOUND_MAX_RETRIES,
+)
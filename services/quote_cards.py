@@ -0,0 +1,150 @@
+"""
+Карточки цитат для !мудрость.
+
+Аватары и готовые PNG кэшируются (LRU + TTL), а file_id загруженной в Telegram
+картинки сохраняется в quotes.card_file_id — повторная цитата отправляется по
+file_id без генерации и загрузки. Сам рендер выполняется в пуле процессов
+(services.card_render), чтобы не блокировать event loop.
+"""
+import asyncio
+import logging
+import multiprocessing
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+
+from aiogram import Bot
+from aiogram.types import BufferedInputFile, Message
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config import settings
+from database.models import Quote
+from services.cache import TTLCache
+from services.card_render import render_card, warm_up
+
+logger = logging.getLogger(__name__)
+
+
+class RenderUnavailable(Exception):
+    """Рендер перегружен или не уложился в таймаут — нужно ответить текстом"""
+
+
+class RenderPool:
+    """Асинхронная обёртка над пулом рендера с ограниченной очередью и таймаутом"""
+
+    def __init__(self, workers: int, kind: str, queue_size: int, timeout: float):
+        self.workers = workers
+        self.kind = kind
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self._executor: Executor | None = None
+        self._pending = 0
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.kind == 'thread':
+                self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix="render")
+            else:
+                # spawn: дочерние процессы не наследуют event loop и соединения с БД
+                self._executor = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+        return self._executor
+
+    def start(self) -> None:
+        """Поднимает воркеры заранее, чтобы первый рендер не ждал запуска процессов"""
+        executor = self._get_executor()
+        for _ in range(self.workers):
+            executor.submit(warm_up)
+
+    async def render(self, author: str, text: str, avatar: bytes | None) -> bytes:
+        if self._pending >= self.queue_size:
+            raise RenderUnavailable("очередь рендера заполнена")
+        loop = asyncio.get_running_loop()
+        job = self._get_executor().submit(render_card, author, text, avatar)
+        # Место в очереди занято, пока задача не закончится в пуле: после таймаута
+        # она продолжает выполняться, и новые рендеры встали бы за ней
+        self._pending += 1
+        job.add_done_callback(lambda _: self._release_from(loop))
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(job), self.timeout)
+        except asyncio.TimeoutError:
+            raise RenderUnavailable("рендер не уложился в таймаут")
+
+    def _release_from(self, loop: asyncio.AbstractEventLoop) -> None:
+        # Колбэк concurrent.futures вызывается из потока пула
+        try:
+            loop.call_soon_threadsafe(self._release)
+        except RuntimeError:
+            pass  # цикл уже закрыт при остановке бота
+
+    def _release(self) -> None:
+        self._pending -= 1
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+render_pool = RenderPool(
+    workers=settings.RENDER_WORKERS,
+    kind=settings.RENDER_EXECUTOR,
+    queue_size=settings.RENDER_QUEUE_SIZE,
+    timeout=settings.RENDER_TIMEOUT,
+)
+
+
+class QuoteCardRenderer:
+    """Выдаёт карточку цитаты: file_id из Telegram, готовый PNG из кэша или новый рендер"""
+
+    def __init__(self, avatar_cache_size: int = 256, avatar_ttl: float = 3600,
+                 png_cache_size: int = 64, png_ttl: float = 3600):
+        self._avatars: TTLCache[int, bytes | None] = TTLCache(avatar_cache_size, avatar_ttl)
+        self._pngs: TTLCache[int, bytes] = TTLCache(png_cache_size, png_ttl)
+
+    async def photo_for(self, bot: Bot, quote: Quote) -> str | BufferedInputFile:
+        """file_id, если карточка уже загружалась в Telegram, иначе PNG-файл"""
+        if quote.card_file_id:
+            return quote.card_file_id
+
+        png = self._pngs.get(quote.id)
+        if png is None:
+            avatar = await self._avatar(bot, quote.author_user_id)
+            png = await render_pool.render(quote.author_name or "Неизвестный", quote.text, avatar)
+            self._pngs.set(quote.id, png)
+        return BufferedInputFile(png, filename="wisdom.png")
+
+    async def remember(self, session: AsyncSession, quote: Quote, sent: Message) -> None:
+        """Сохраняет file_id отправленной карточки, чтобы больше её не загружать"""
+        if quote.card_file_id or not sent.photo:
+            return
+        await self._store_file_id(session, quote, sent.photo[-1].file_id)
+        self._pngs.pop(quote.id)
+
+    async def forget(self, session: AsyncSession, quote: Quote) -> None:
+        """Сбрасывает file_id, который Telegram больше не принимает"""
+        if quote.card_file_id:
+            await self._store_file_id(session, quote, None)
+
+    @staticmethod
+    async def _store_file_id(session: AsyncSession, quote: Quote, file_id: str | None) -> None:
+        quote.card_file_id = file_id
+        await session.execute(update(Quote).where(Quote.id == quote.id).values(card_file_id=file_id))
+
+    async def _avatar(self, bot: Bot, user_id: int) -> bytes | None:
+        if user_id in self._avatars:
+            return self._avatars.get(user_id)
+
+        avatar = None
+        try:
+            photos = await bot.get_user_profile_photos(user_id, limit=1)
+            if photos.total_count > 0:
+                file = await bot.get_file(photos.photos[0][0].file_id)
+                downloaded = await bot.download_file(file.file_path)
+                avatar = downloaded.read() if downloaded is not None else None
+        except Exception as e:
+            logger.debug("Не удалось получить аватар %s: %s", user_id, e)
+        # Отсутствие аватара тоже кэшируем, чтобы не спрашивать Telegram каждый раз
+        self._avatars.set(user_id, avatar)
+        return avatar
+
+
+quote_cards = QuoteCardRenderer()
@@ -0,0 +1,111 @@
+"""
+Выбор случайной цитаты для !мудрость.
+
+Для чата держится отсортированный список id его цитат (только числа, без
+текстов): он загружается при первом запросе и пополняется после сброса
+буфера записи. Случайная позиция выбирается за O(1), из базы читается одна
+цитата по первичному ключу. Без settings.single_process позиция превращается
+в OFFSET по индексу (chat_id, id).
+
+Настройки выбора:
+- QUOTE_RECENCY_WEIGHT — 1 равномерно, больше 1 — чаще свежие цитаты
+  (плотность вероятности ∝ позиция^(weight-1));
+- QUOTE_NO_REPEAT — не повторять последние N показанных в чате цитат.
+"""
+import random
+from collections import deque
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config import settings
+from database.engine import AsyncSessionLocal
+from database.models import Quote
+from services.write_behind import write_behind
+
+# Сколько раз перевыбирать, если попали в недавно показанную цитату
+_REPEAT_ATTEMPTS = 8
+
+
+class QuotePicker:
+    """Случайная цитата чата без загрузки всех цитат"""
+
+    def __init__(self, use_cache: bool, recency_weight: float, no_repeat: int):
+        self.use_cache = use_cache
+        self.recency_weight = max(recency_weight, 0.01)
+        self.no_repeat = no_repeat
+        self._ids: dict[int, list[int]] = {}
+        self._shown: dict[int, deque[int]] = {}
+        write_behind.on_quotes_saved(self._saved)
+
+    def _saved(self, rows: list[tuple[int, int]]) -> None:
+        for chat_id, quote_id in rows:
+            ids = self._ids.get(chat_id)
+            if ids is not None:
+                ids.append(quote_id)  # id растут, список остаётся отсортированным
+
+    def _position(self, total: int) -> int:
+        # u^(1/w) при w > 1 смещает выбор к концу списка, то есть к новым цитатам
+        return min(int(total * random.random() ** (1 / self.recency_weight)), total - 1)
+
+    async def pick(self, chat_id: int, session: AsyncSession | None = None) -> Quote | None:
+        """
+        Случайная цитата чата с учётом настроек; None, если цитат нет.
+        Хендлер передаёт свою сессию апдейта, без неё открывается отдельная.
+        """
+        if session is None:
+            async with AsyncSessionLocal() as session:
+                return await self.pick(chat_id, session)
+
+        async with write_behind.flushed():
+            if self.use_cache:
+                ids = self._ids.get(chat_id)
+                if ids is None:
+                    ids = self._ids[chat_id] = await self._load_ids(session, chat_id)
+                total = len(ids)
+            else:
+                ids = None
+                total = await self._count(session, chat_id)
+        if not total:
+            return None
+
+        shown = self._shown.setdefault(chat_id, deque(maxlen=self.no_repeat)) if self.no_repeat else ()
+        for attempt in range(_REPEAT_ATTEMPTS):
+            pos = self._position(total)
+            quote_id = ids[pos] if ids is not None else await self._id_at(session, chat_id, pos)
+            # Если цитат не больше, чем запоминаем показов, повтор неизбежен
+            if quote_id not in shown or total <= self.no_repeat:
+                break
+        if quote_id is None:
+            return None
+        quote = await session.get(Quote, quote_id)
+
+        if self.no_repeat:
+            shown.append(quote_id)
+        return quote
+
+    @staticmethod
+    async def _load_ids(session: AsyncSession, chat_id: int) -> list[int]:
+        result = await session.execute(
+            select(Quote.id).where(Quote.chat_id == chat_id).order_by(Quote.id)
+        )
+        return list(result.scalars().all())
+
+    @staticmethod
+    async def _count(session: AsyncSession, chat_id: int) -> int:
+        return await session.scalar(
+            select(func.count()).select_from(Quote).where(Quote.chat_id == chat_id)
+        )
+
+    @staticmethod
+    async def _id_at(session: AsyncSession, chat_id: int, pos: int) -> int | None:
+        return await session.scalar(
+            select(Quote.id).where(Quote.chat_id == chat_id).order_by(Quote.id).offset(pos).limit(1)
+        )
+
+
+quote_picker = QuotePicker(
+    use_cache=settings.single_process,
+    recency_weight=settings.QUOTE_RECENCY_WEIGHT,
+    no_repeat=settings.QUOTE_NO_REPEAT,
+)
@@ -0,0 +1,97 @@
+"""
+Поиск по архиву цитат (!цитаты).
+
+Совпадения ищутся по полнотекстовому индексу (database.fulltext), лента идёт
+от новых к старым с keyset-пагинацией по (created_at, id): следующая страница
+— это WHERE (created_at, id) < курсор, без OFFSET, поэтому стоимость не растёт
+с глубиной листания. Параметры поиска хранятся в памяти под коротким токеном,
+чтобы кнопка «Дальше» уложилась в 64 байта callback_data.
+"""
+import secrets
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config import settings
+from database.engine import AsyncSessionLocal
+from database.fulltext import quote_match
+from database.models import Quote
+from services.cache import TTLCache
+from services.write_behind import write_behind
+
+_EPOCH = datetime(1970, 1, 1)
+_MICROSECOND = timedelta(microseconds=1)
+
+
+@dataclass(frozen=True)
+class QuoteSearch:
+    chat_id: int
+    query: str | None = None
+    author_id: int | None = None
+
+
+@dataclass(frozen=True)
+class Cursor:
+    """Позиция в ленте: последняя показанная цитата"""
+    created_at: datetime
+    id: int
+
+    def encode(self) -> str:
+        # Целые микросекунды: float потерял бы точность и сломал сравнение
+        return f"{(self.created_at - _EPOCH) // _MICROSECOND}.{self.id}"
+
+    @classmethod
+    def decode(cls, value: str) -> "Cursor":
+        micros, quote_id = value.split(".")
+        return cls(_EPOCH + int(micros) * _MICROSECOND, int(quote_id))
+
+
+class QuoteSearcher:
+    """Постраничный поиск цитат чата по тексту и/или автору"""
+
+    def __init__(self, page_size: int):
+        self.page_size = page_size
+        self._searches: TTLCache[str, QuoteSearch] = TTLCache(512, 3600)
+
+    def remember(self, search: QuoteSearch) -> str:
+        token = secrets.token_hex(4)
+        self._searches.set(token, search)
+        return token
+
+    def recall(self, token: str) -> QuoteSearch | None:
+        return self._searches.get(token)
+
+    async def page(self, search: QuoteSearch, after: Cursor | None = None,
+                   session: AsyncSession | None = None) -> tuple[list[Quote], Cursor | None]:
+        """
+        Страница цитат и курсор следующей (None — это последняя).
+        Хендлер передаёт свою сессию апдейта, без неё открывается отдельная.
+        """
+        if session is None:
+            async with AsyncSessionLocal() as session:
+                return await self.page(search, after, session)
+
+        await write_behind.flush()
+        stmt = select(Quote).where(Quote.chat_id == search.chat_id)
+        if search.query:
+            match = quote_match(session.bind.dialect.name, search.query)
+            if match is None:
+                return [], None
+            stmt = stmt.where(match)
+        if search.author_id is not None:
+            stmt = stmt.where(Quote.author_user_id == search.author_id)
+        if after is not None:
+            stmt = stmt.where(tuple_(Quote.created_at, Quote.id) < tuple_(after.created_at, after.id))
+        stmt = stmt.order_by(Quote.created_at.desc(), Quote.id.desc()).limit(self.page_size + 1)
+        quotes = list((await session.execute(stmt)).scalars().all())
+
+        if len(quotes) <= self.page_size:
+            return quotes, None
+        quotes = quotes[:self.page_size]
+        last = quotes[-1]
+        return quotes, Cursor(last.created_at, last.id)
+
+
+quote_searcher = QuoteSearcher(page_size=settings.QUOTE_SEARCH_PAGE_SIZE)
@@ -0,0 +1,105 @@
+"""
+Планировщик побудок (!разбудить).
+
+Ближайшие побудки лежат в min-куче по времени; планировщик спит ровно до
+ближайшей и просыпается раньше, если cmd_wake добавил более раннюю.
+"""
+import asyncio
+import heapq
+import logging
+from datetime import datetime, timedelta
+
+from aiogram import Bot
+from sqlalchemy import select, update
+
+from config import settings
+from database.engine import AsyncSessionLocal
+from database.models import Wakeup
+from services.outbound import Priority, outbound
+
+logger = logging.getLogger(__name__)
+
+# Через сколько повторить побудку, если база не дала её «забрать»
+CLAIM_RETRY_DELAY = timedelta(seconds=30)
+
+
+class WakeupScheduler:
+    """Событийный планировщик побудок с ограниченным параллелизмом отправки"""
+
+    def __init__(self, concurrency: int):
+        # (wake_at, id, chat_id, user_id)
+        self._heap: list[tuple[datetime, int, int, int]] = []
+        self._changed = asyncio.Event()
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._sending: set[asyncio.Task] = set()
+        self._bot: Bot | None = None
+
+    async def start(self, bot: Bot) -> asyncio.Task:
+        """Загружает невыполненные побудки из базы и запускает цикл"""
+        self._bot = bot
+        async with AsyncSessionLocal() as session:
+            result = await session.execute(
+                select(Wakeup.wake_at, Wakeup.id, Wakeup.chat_id, Wakeup.user_id)
+                .where(Wakeup.done == False)
+            )
+            self._heap = [tuple(row) for row in result.all()]
+        heapq.heapify(self._heap)
+        logger.info("Планировщик побудок: в очереди %d", len(self._heap))
+        return asyncio.create_task(self._run())
+
+    def schedule(self, wakeup: Wakeup) -> None:
+        """Добавляет сохранённую побудку; будит цикл, если она стала ближайшей"""
+        self._push((wakeup.wake_at, wakeup.id, wakeup.chat_id, wakeup.user_id))
+
+    def _push(self, entry: tuple[datetime, int, int, int]) -> None:
+        heapq.heappush(self._heap, entry)
+        if self._heap[0] is entry:
+            self._changed.set()
+
+    async def _run(self) -> None:
+        while True:
+            self._changed.clear()
+            now = datetime.utcnow()
+            while self._heap and self._heap[0][0] <= now:
+                task = asyncio.create_task(self._fire(*heapq.heappop(self._heap)))
+                self._sending.add(task)
+                task.add_done_callback(self._sending.discard)
+
+            timeout = (self._heap[0][0] - now).total_seconds() if self._heap else None
+            try:
+                await asyncio.wait_for(self._changed.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _fire(self, wake_at: datetime, wakeup_id: int, chat_id: int, user_id: int) -> None:
+        async with self._semaphore:
+            # Помечаем строку выполненной до отправки: при нескольких воркерах
+            # побудку отправит только тот, кто первым её «забрал»
+            try:
+                async with AsyncSessionLocal() as session:
+                    result = await session.execute(
+                        update(Wakeup)
+                        .where(Wakeup.id == wakeup_id, Wakeup.done == False)
+                        .values(done=True)
+                    )
+                    await session.commit()
+            except Exception:
+                # Запись уже снята с кучи — возвращаем её, иначе побудка потеряется до рестарта
+                logger.exception("Не удалось забрать побудку %d, повтор через %s", wakeup_id, CLAIM_RETRY_DELAY)
+                self._push((datetime.utcnow() + CLAIM_RETRY_DELAY, wakeup_id, chat_id, user_id))
+                return
+            if result.rowcount != 1:
+                return
+
+            try:
+                with outbound.lane(Priority.NORMAL):
+                    await self._bot.send_message(
+                        chat_id,
+                        f"⏰ Пора вставать! <a href=\"tg://user?id={user_id}\">тебя</a>",
+                        parse_mode="HTML"
+                    )
+            except Exception as e:
+                logger.warning("Не удалось отправить побудку %d: %s", wakeup_id, e)
+
+
+wakeup_scheduler = WakeupScheduler(concurrency=settings.WAKEUP_CONCURRENCY)
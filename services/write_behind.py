@@ -0,0 +1,145 @@
+"""
+Отложенная запись частых событий (!пиво, !цитата).
+
+Хендлер только кладёт событие в буфер и сразу отвечает; наливания одному и
+тому же пользователю суммируются в памяти. Буфер сбрасывается одной
+транзакцией раз в WRITE_BEHIND_INTERVAL_MS или при накоплении
+WRITE_BEHIND_MAX_EVENTS событий, а также при остановке бота. Перед чтением
+этих таблиц нужно вызвать flush(), чтобы увидеть ещё не записанное.
+"""
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import Callable
+
+from sqlalchemy import insert
+
+from config import settings
+from database.engine import AsyncSessionLocal
+from database.models import Quote
+from services.beer import beer_upsert
+
+logger = logging.getLogger(__name__)
+
+
+class WriteBehindBuffer:
+    """Буфер счётчиков пива и новых цитат со сбросом по таймеру или объёму"""
+
+    def __init__(self, interval_ms: int, max_events: int):
+        self.interval = interval_ms / 1000
+        self.max_events = max_events
+        # (chat_id, user_id) -> [count, username, updated_at]
+        self._beer: dict[tuple[int, int], list] = {}
+        self._quotes: list[dict] = []
+        self._events = 0
+        self._full = asyncio.Event()
+        self._lock = asyncio.Lock()
+        self._quote_listeners: list[Callable[[list[tuple[int, int]]], None]] = []
+
+    def __len__(self) -> int:
+        return self._events
+
+    def add_beer(self, chat_id: int, user_id: int, username: str | None, amount: int = 1) -> None:
+        pending = self._beer.get((chat_id, user_id))
+        if pending is None:
+            self._beer[(chat_id, user_id)] = [amount, username, datetime.utcnow()]
+        else:
+            pending[0] += amount
+            pending[1] = username
+            pending[2] = datetime.utcnow()
+        self._added()
+
+    def add_quote(self, **values) -> None:
+        values.setdefault('created_at', datetime.utcnow())
+        self._quotes.append(values)
+        self._added()
+
+    def pending_beer(self, chat_id: int) -> list[tuple[int, str | None, int]]:
+        """Ещё не записанные наливания чата: (user_id, username, count)"""
+        return [
+            (user_id, username, count)
+            for (pending_chat, user_id), (count, username, _) in self._beer.items()
+            if pending_chat == chat_id
+        ]
+
+    def on_quotes_saved(self, listener: Callable[[list[tuple[int, int]]], None]) -> None:
+        """listener получает [(chat_id, quote_id)] после каждого сброса цитат в базу"""
+        self._quote_listeners.append(listener)
+
+    def _added(self) -> None:
+        self._events += 1
+        if self._events >= self.max_events:
+            self._full.set()
+
+    def start(self) -> asyncio.Task:
+        return asyncio.create_task(self._run())
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._full.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("Не удалось сбросить буфер записи")
+
+    async def flush(self) -> None:
+        """Записывает накопленное одной транзакцией"""
+        async with self._lock:
+            await self._flush_locked()
+
+    @asynccontextmanager
+    async def flushed(self):
+        """
+        Сбрасывает буфер и не даёт сбросить его снова до выхода из блока:
+        внутри блока база содержит ровно то, что было добавлено до входа.
+        """
+        async with self._lock:
+            await self._flush_locked()
+            yield
+
+    async def _flush_locked(self) -> None:
+        self._full.clear()
+        if not self._events:
+            return
+        beer, self._beer = self._beer, {}
+        quotes, self._quotes = self._quotes, []
+        self._events = 0
+
+        saved_quotes = []
+        try:
+            async with AsyncSessionLocal() as session:
+                if beer:
+                    await session.execute(beer_upsert(session, [
+                        {'chat_id': chat_id, 'user_id': user_id, 'username': username,
+                         'count': count, 'updated_at': updated_at}
+                        for (chat_id, user_id), (count, username, updated_at) in beer.items()
+                    ]))
+                if quotes:
+                    result = await session.execute(insert(Quote).returning(Quote.chat_id, Quote.id), quotes)
+                    saved_quotes = [tuple(row) for row in result.all()]
+                await session.commit()
+        except Exception:
+            # Возвращаем события в буфер, чтобы не потерять их до следующей попытки
+            self._requeue(beer, quotes)
+            raise
+
+        if saved_quotes:
+            for listener in self._quote_listeners:
+                listener(saved_quotes)
+
+    def _requeue(self, beer: dict, quotes: list) -> None:
+        for (chat_id, user_id), (count, username, updated_at) in beer.items():
+            pending = self._beer.setdefault((chat_id, user_id), [0, username, updated_at])
+            pending[0] += count
+        self._quotes[:0] = quotes
+        self._events += len(beer) + len(quotes)
+
+
+write_behind = WriteBehindBuffer(
+    interval_ms=settings.WRITE_BEHIND_INTERVAL_MS,
+    max_events=settings.WRITE_BEHIND_MAX_EVENTS,
+)
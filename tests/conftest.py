@@ -0,0 +1,37 @@
+"""
+Общая настройка тестов: отдельная SQLite-база во временном каталоге.
+
+Переменные окружения выставляются до импорта config — настройки и движок БД
+создаются при импорте модулей бота.
+"""
+import asyncio
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+_TMP = tempfile.mkdtemp(prefix="bot-tests-")
+os.environ.setdefault("BOT_TOKEN", "123456:TEST")
+os.environ["DB_URL"] = f"sqlite+aiosqlite:///{_TMP}/test.db"
+os.environ["POSTGRES_HOST"] = "localhost"
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from database.engine import engine  # noqa: E402
+from database.models import Base  # noqa: E402
+
+
+@pytest.fixture
+def db():
+    """Чистые таблицы для каждого теста"""
+    async def reset():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.drop_all)
+            await conn.run_sync(Base.metadata.create_all)
+        # aiosqlite-соединения привязаны к циклу событий — не переносим их в следующий тест
+        await engine.dispose()
+
+    asyncio.run(reset())
+    yield
@@ -0,0 +1,61 @@
+import asyncio
+
+from sqlalchemy import delete, select, update
+
+from database.engine import AsyncSessionLocal, engine
+from database.fulltext import quote_match
+from database.models import Quote
+
+
+def _search(query: str) -> list[str]:
+    async def run():
+        async with AsyncSessionLocal() as session:
+            condition = quote_match(session.bind.dialect.name, query)
+            rows = await session.scalars(select(Quote.text).where(condition).order_by(Quote.id))
+            result = list(rows)
+        await engine.dispose()
+        return result
+
+    return asyncio.run(run())
+
+
+def _execute(*statements) -> None:
+    async def run():
+        async with AsyncSessionLocal() as session:
+            for statement in statements:
+                if isinstance(statement, Quote):
+                    session.add(statement)
+                else:
+                    await session.execute(statement)
+            await session.commit()
+        await engine.dispose()
+
+    asyncio.run(run())
+
+
+def test_yo_and_ye_match_each_other(db):
+    _execute(Quote(chat_id=1, author_user_id=1, quoter_user_id=2, text="Ёлка в офисе", author_name="Пётр"),
+             Quote(chat_id=1, author_user_id=1, quoter_user_id=2, text="Елка на улице", author_name="Иван"))
+
+    assert _search("ёлка") == ["Ёлка в офисе", "Елка на улице"]
+    assert _search("елка") == ["Ёлка в офисе", "Елка на улице"]
+    assert _search("петр") == ["Ёлка в офисе"]
+
+
+def test_index_follows_update_and_delete(db):
+    _execute(Quote(chat_id=1, author_user_id=1, quoter_user_id=2, text="Всё пиво выпито", author_name="Фёдор"))
+    _execute(update(Quote).values(text="Всё вино выпито"))
+
+    assert _search("пиво") == []
+    assert _search("все вино") == ["Всё вино выпито"]
+
+    _execute(delete(Quote))
+    assert _search("вино") == []
+
+
+def test_prefix_matches_longer_forms_only(db):
+    _execute(Quote(chat_id=1, author_user_id=1, quoter_user_id=2, text="Пивом не угощу", author_name="Аня"),
+             Quote(chat_id=1, author_user_id=1, quoter_user_id=2, text="Два пива", author_name="Оля"))
+
+    assert _search("пиво") == ["Пивом не угощу"]
+    assert _search("пив") == ["Пивом не угощу", "Два пива"]
@@ -0,0 +1,55 @@
+import asyncio
+
+from sqlalchemy import select
+
+import services.write_behind as write_behind_module
+from database.engine import AsyncSessionLocal, engine
+from database.models import BeerStat
+from services.leaderboard import BeerLeaderboard
+from services.write_behind import write_behind
+
+CHAT = -100
+
+
+def test_pour_during_load_reaches_board(db, monkeypatch):
+    board = BeerLeaderboard(use_cache=True)
+
+    def session_with_pour():
+        # Второй !пиво приходит, пока загрузка топа сбрасывает буфер в базу:
+        # он попадает уже в новый буфер, а не в этот сброс
+        monkeypatch.setattr(write_behind_module, "AsyncSessionLocal", AsyncSessionLocal)
+        board.record(CHAT, 1, "a")
+        return AsyncSessionLocal()
+
+    async def scenario():
+        board.record(CHAT, 1, "a")
+        monkeypatch.setattr(write_behind_module, "AsyncSessionLocal", session_with_pour)
+        top = await board.top(CHAT, 10)
+
+        await write_behind.flush()
+        async with AsyncSessionLocal() as session:
+            stored = (await session.execute(
+                select(BeerStat.count).where(BeerStat.chat_id == CHAT, BeerStat.user_id == 1)
+            )).scalar_one()
+        after_flush = await board.top(CHAT, 10)
+        await engine.dispose()
+        return top, stored, after_flush
+
+    top, stored, after_flush = asyncio.run(scenario())
+    assert stored == 2
+    assert top == [(1, "a", 2)]
+    assert after_flush == [(1, "a", 2)]
+
+
+def test_concurrent_tops_share_one_load(db):
+    board = BeerLeaderboard(use_cache=True)
+
+    async def scenario():
+        async with AsyncSessionLocal() as session:
+            session.add(BeerStat(chat_id=CHAT, user_id=1, username="a", count=7))
+            await session.commit()
+        tops = await asyncio.gather(board.top(CHAT, 10), board.top(CHAT, 10))
+        await engine.dispose()
+        return tops
+
+    assert asyncio.run(scenario()) == [[(1, "a", 7)], [(1, "a", 7)]]
@@ -1,14 +1,172 @@
 import asyncio
+import hashlib
+import json
+from dataclasses import dataclass, field
 from pathlib import Path
 from datetime import datetime
 import openpyxl
-from sqlalchemy import select
+from sqlalchemy import select, delete
 
-from database.models import User
+from database.models import User, ImportState
 from database.engine import AsyncSessionLocal
+from database.dialect import dialect_insert
+from services.directory import directory
 
 
-async def load_users_from_excel(excel_path: str):
+# Колонки users, которые заполняются из Excel (telegram_id бот заполняет сам)
+EXCEL_COLUMNS = (
+    'full_name', 'department', 'telegram_username', 'birth_date', 'faculty', 'course',
+    'study_group', 'phone_number', 'has_car', 'nearest_metro', 'address'
+)
+
+# Размер пачки для bulk upsert (с запасом под лимит параметров SQLite)
+UPSERT_BATCH_SIZE = 500
+
+
+def _parse_birth_date(birth_date_val) -> str | None:
+    """Приводит дату рождения к формату DD.MM.YYYY"""
+    if birth_date_val is None:
+        return None
+    # Если это datetime объект (openpyxl может вернуть datetime)
+    if isinstance(birth_date_val, datetime):
+        return birth_date_val.strftime('%d.%m.%Y')
+    if not isinstance(birth_date_val, str):
+        return None
+    # Если это строка, проверяем формат
+    birth_date_val = birth_date_val.strip()
+    if not birth_date_val:
+        return None
+    if len(birth_date_val) <= 10 and '.' in birth_date_val:
+        # Уже в формате DD.MM.YYYY
+        return birth_date_val[:10]
+    # Пробуем распарсить разные форматы
+    try:
+        # Формат '2004-05-26 00:00:00' или '2004-05-26'
+        date_part = birth_date_val.split()[0] if ' ' in birth_date_val else birth_date_val
+        dt = datetime.strptime(date_part, '%Y-%m-%d')
+        return dt.strftime('%d.%m.%Y')
+    except ValueError:
+        # Если не получилось, обрезаем до 10 символов
+        return birth_date_val[:10] if len(birth_date_val) > 10 else birth_date_val
+
+
+def _parse_row(row: tuple) -> dict | None:
+    """Превращает строку Excel в словарь полей User; None — если нет ФИО или подразделения"""
+    # Безопасное получение значения по индексу
+    def get_value(idx, default=None, as_string=True):
+        if idx < len(row) and row[idx] is not None:
+            val = row[idx]
+            if as_string:
+                return str(val).strip() if str(val).strip() else default
+            return val
+        return default
+
+    # Извлекаем данные
+    full_name = get_value(0)
+    department = get_value(1)
+
+    # Проверяем обязательные поля
+    if not full_name or not department:
+        return None
+
+    # Извлекаем необязательные поля
+    telegram_username = get_value(2)
+    if telegram_username and telegram_username.startswith('@'):
+        telegram_username = telegram_username[1:]  # Убираем @
+
+    # Курс обучения
+    course = None
+    course_val = get_value(5)
+    if course_val:
+        try:
+            course = int(course_val)
+        except (ValueError, TypeError):
+            pass
+
+    return {
+        'full_name': full_name,
+        'department': department,
+        'telegram_username': telegram_username,
+        # Сырое значение без преобразования в строку
+        'birth_date': _parse_birth_date(get_value(3, as_string=False)),
+        'faculty': get_value(4),
+        'course': course,
+        'study_group': get_value(6),
+        'phone_number': get_value(7),
+        'has_car': get_value(8),
+        'nearest_metro': get_value(9),
+        'address': get_value(10),
+    }
+
+
+def row_hash(row: dict) -> str:
+    """Хэш содержимого строки Excel — по нему определяем, изменилась ли запись"""
+    payload = json.dumps([row[col] for col in EXCEL_COLUMNS], ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def file_digest(excel_path: str) -> str:
+    sha = hashlib.sha256()
+    with open(excel_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 16), b''):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def parse_excel(excel_path: str) -> tuple[list[dict], int]:
+    """
+    Потоково читает Excel (read_only) и возвращает строки для users и число
+    пропущенных строк. Синхронная функция — вызывается в отдельном потоке.
+    """
+    wb = openpyxl.load_workbook(excel_path, read_only=True, data_only=True)
+    try:
+        ws = wb.active
+        rows: dict[str, dict] = {}
+        skipped = 0
+        is_first_row = True
+        for row_idx, row in enumerate(ws.iter_rows(min_row=1, values_only=True), start=1):
+            # Пропускаем пустые строки
+            if not row or not any(row):
+                continue
+
+            # Проверяем, является ли первая строка заголовками
+            if is_first_row:
+                is_first_row = False
+                first_row_values = [str(val).lower().strip() if val else "" for val in row[:5]]
+                header_keywords = ['фио', 'подразделение', 'юзернейм', 'дата', 'фамилия', 'имя', 'отчество']
+                if any(keyword in ' '.join(first_row_values) for keyword in header_keywords):
+                    skipped += 1
+                    continue
+
+            data = _parse_row(row)
+            if data is None:
+                print(f"⚠️  Строка {row_idx}: пропущена (отсутствуют ФИО или подразделение)")
+                skipped += 1
+                continue
+            data['row_hash'] = row_hash(data)
+            # При повторе ФИО в файле побеждает последняя строка
+            rows[data['full_name']] = data
+    finally:
+        wb.close()
+    return list(rows.values()), skipped
+
+
+@dataclass
+class ImportSummary:
+    """Итог импорта Excel: какие организаторы добавлены, изменены и удалены"""
+    added: list[str] = field(default_factory=list)
+    updated: list[str] = field(default_factory=list)
+    deleted: list[str] = field(default_factory=list)
+    unchanged: int = 0
+    skipped: int = 0
+    file_unchanged: bool = False
+
+    @property
+    def has_changes(self) -> bool:
+        return bool(self.added or self.updated or self.deleted)
+
+
+async def load_users_from_excel(excel_path: str, force: bool = False) -> ImportSummary | None:
     """
     Загружает данных организаторов из Excel файла в базу данных
     
@@ -24,155 +182,106 @@ async def load_users_from_excel(excel_path: str):
     8. Есть ли у тебя водительские права и машина?
     9. Напиши ближайшую(-ие) к тебе станции метро
     10. Адрес проживания
+    
+    Импорт инкрементальный: если файл не менялся (mtime и sha256), он не
+    читается вовсе; иначе в базу пишутся только добавленные, изменённые
+    (по хэшу строки) и удалённые из файла организаторы. force=True
+    игнорирует сохранённый отпечаток файла.
     """
-    if not Path(excel_path).exists():
+    path = Path(excel_path)
+    if not path.exists():
         print(f"❌ Файл {excel_path} не найден!")
-        return
-    
-    print(f"📂 Загружаю данные из {excel_path}...")
+        return None
     
-    # Загружаем Excel файл
-    wb = openpyxl.load_workbook(excel_path)
-    ws = wb.active
-    
-    added = 0
-    updated = 0
-    skipped = 0
+    source = str(path.resolve())
+    mtime = path.stat().st_mtime
     
     async with AsyncSessionLocal() as session:
-        # Начинаем с первой строки
-        is_first_row = True
-        for row_idx, row in enumerate(ws.iter_rows(min_row=1, values_only=True), start=1):
-            # Пропускаем пустые строки
-            if not row or not any(row):
-                continue
-            
-            # Безопасное получение значения по индексу
-            def get_value(idx, default=None, as_string=True):
-                if idx < len(row) and row[idx] is not None:
-                    val = row[idx]
-                    if as_string:
-                        return str(val).strip() if str(val).strip() else default
-                    return val
-                return default
-            
-            # Проверяем, является ли первая строка заголовками
-            if is_first_row:
-                first_row_values = [str(val).lower().strip() if val else "" for val in row[:5]]
-                # Если первая строка содержит типичные заголовки, пропускаем её
-                header_keywords = ['фио', 'подразделение', 'юзернейм', 'дата', 'фамилия', 'имя', 'отчество']
-                if any(keyword in ' '.join(first_row_values) for keyword in header_keywords):
-                    print(f"📋 Строка {row_idx}: пропущена (заголовки)")
-                    is_first_row = False
-                    skipped += 1
-                    continue
-                is_first_row = False
-            
-            # Извлекаем данные
-            full_name = get_value(0)
-            department = get_value(1)
-            
-            # Проверяем обязательные поля
-            if not full_name or not department:
-                print(f"⚠️  Строка {row_idx}: пропущена (отсутствуют ФИО или подразделение)")
-                skipped += 1
-                continue
-            
-            # Извлекаем необязательные поля
-            telegram_username = get_value(2)
-            if telegram_username and telegram_username.startswith('@'):
-                telegram_username = telegram_username[1:]  # Убираем @
-            
-            # Обработка даты рождения (получаем сырое значение без преобразования в строку)
-            birth_date = None
-            birth_date_val = get_value(3, as_string=False)
-            if birth_date_val is not None:
-                # Если это datetime объект (openpyxl может вернуть datetime)
-                if isinstance(birth_date_val, datetime):
-                    birth_date = birth_date_val.strftime('%d.%m.%Y')
-                elif isinstance(birth_date_val, str):
-                    # Если это строка, проверяем формат
-                    birth_date_val = birth_date_val.strip()
-                    if not birth_date_val:
-                        birth_date = None
-                    elif len(birth_date_val) <= 10 and '.' in birth_date_val:
-                        # Уже в формате DD.MM.YYYY
-                        birth_date = birth_date_val[:10]
-                    else:
-                        # Пробуем распарсить разные форматы
-                        try:
-                            # Формат '2004-05-26 00:00:00' или '2004-05-26'
-                            date_part = birth_date_val.split()[0] if ' ' in birth_date_val else birth_date_val
-                            dt = datetime.strptime(date_part, '%Y-%m-%d')
-                            birth_date = dt.strftime('%d.%m.%Y')
-                        except ValueError:
-                            # Если не получилось, обрезаем до 10 символов
-                            birth_date = birth_date_val[:10] if len(birth_date_val) > 10 else birth_date_val
-            faculty = get_value(4)
-            
-            # Курс обучения
-            course = None
-            course_val = get_value(5)
-            if course_val:
-                try:
-                    course = int(course_val)
-                except (ValueError, TypeError):
-                    pass
-            
-            study_group = get_value(6)
-            phone_number = get_value(7)
-            has_car = get_value(8)
-            nearest_metro = get_value(9)
-            address = get_value(10)
-            
-            # Проверяем, существует ли уже пользователь с таким ФИО
-            result = await session.execute(
-                select(User).where(User.full_name == full_name)
-            )
-            existing_user = result.scalar_one_or_none()
-            
-            if existing_user:
-                # Обновляем существующего пользователя
-                existing_user.department = department
-                existing_user.telegram_username = telegram_username
-                existing_user.birth_date = birth_date
-                existing_user.faculty = faculty
-                existing_user.course = course
-                existing_user.study_group = study_group
-                existing_user.phone_number = phone_number
-                existing_user.has_car = has_car
-                existing_user.nearest_metro = nearest_metro
-                existing_user.address = address
-                updated += 1
-                print(f"♻️  Обновлен: {full_name}")
+        state = (await session.execute(
+            select(ImportState).where(ImportState.source == source)
+        )).scalar_one_or_none()
+        
+        digest = None
+        if state and not force:
+            if state.mtime == mtime:
+                print(f"✅ {excel_path} не изменился с последнего импорта")
+                return ImportSummary(file_unchanged=True)
+            digest = await asyncio.to_thread(file_digest, excel_path)
+            if state.digest == digest:
+                # Файл пересохранили без изменений — запоминаем новый mtime
+                state.mtime = mtime
+                await session.commit()
+                print(f"✅ {excel_path} не изменился с последнего импорта")
+                return ImportSummary(file_unchanged=True)
+        
+        print(f"📂 Загружаю данные из {excel_path}...")
+        
+        # Разбор файла не блокирует event loop бота
+        if digest is None:
+            digest = await asyncio.to_thread(file_digest, excel_path)
+        rows, skipped = await asyncio.to_thread(parse_excel, excel_path)
+        
+        # Один запрос на все существующие записи вместо SELECT на каждую строку
+        result = await session.execute(select(User.id, User.full_name, User.row_hash))
+        existing = {name: (user_id, hash_) for user_id, name, hash_ in result.all()}
+        
+        summary = ImportSummary(skipped=skipped)
+        changed = []
+        for row in rows:
+            current = existing.get(row['full_name'])
+            if current is None:
+                summary.added.append(row['full_name'])
+                changed.append(row)
+            elif current[1] != row['row_hash']:
+                summary.updated.append(row['full_name'])
+                changed.append(row)
             else:
-                # Создаем нового пользователя
-                user = User(
-                    full_name=full_name,
-                    department=department,
-                    telegram_username=telegram_username,
-                    birth_date=birth_date,
-                    faculty=faculty,
-                    course=course,
-                    study_group=study_group,
-                    phone_number=phone_number,
-                    has_car=has_car,
-                    nearest_metro=nearest_metro,
-                    address=address
-                )
-                session.add(user)
-                added += 1
-                print(f"✅ Добавлен: {full_name}")
+                summary.unchanged += 1
+        
+        file_names = {row['full_name'] for row in rows}
+        removed = {name: user_id for name, (user_id, _) in existing.items() if name not in file_names}
+        summary.deleted = sorted(removed)
+        
+        now = datetime.utcnow()
+        for start in range(0, len(changed), UPSERT_BATCH_SIZE):
+            batch = [{**row, 'created_at': now, 'updated_at': now} for row in changed[start:start + UPSERT_BATCH_SIZE]]
+            stmt = dialect_insert(session, User).values(batch)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[User.full_name],
+                set_={
+                    **{col: stmt.excluded[col] for col in EXCEL_COLUMNS if col != 'full_name'},
+                    'row_hash': stmt.excluded.row_hash,
+                    'updated_at': stmt.excluded.updated_at,
+                }
+            )
+            await session.execute(stmt)
+        
+        if removed:
+            await session.execute(delete(User).where(User.id.in_(list(removed.values()))))
+        
+        # Запоминаем отпечаток файла
+        if state is None:
+            session.add(ImportState(source=source, mtime=mtime, digest=digest, imported_at=now))
+        else:
+            state.mtime = mtime
+            state.digest = digest
+            state.imported_at = now
         
         # Сохраняем изменения
         await session.commit()
     
+    # Пересобираем справочник в памяти, только если что-то поменялось
+    if summary.has_changes:
+        await directory.reload()
+    
     print("\n" + "="*50)
-    print(f"✅ Добавлено новых: {added}")
-    print(f"♻️  Обновлено: {updated}")
-    print(f"⚠️  Пропущено: {skipped}")
-    print(f"📊 Итого обработано: {added + updated + skipped}")
+    print(f"✅ Добавлено новых: {len(summary.added)}")
+    print(f"♻️  Обновлено: {len(summary.updated)}")
+    print(f"🗑️  Удалено: {len(summary.deleted)}")
+    print(f"💤 Без изменений: {summary.unchanged}")
+    print(f"⚠️  Пропущено: {summary.skipped}")
     print("="*50)
+    return summary
 
 
 async def clear_users_table():
@@ -184,8 +293,13 @@ async def clear_users_table():
         for user in users:
             await session.delete(user)
         
+        # Следующий импорт должен перечитать файл целиком
+        await session.execute(delete(ImportState))
+        
         await session.commit()
         print(f"🗑️  Удалено пользователей: {len(users)}")
+    
+    await directory.reload()
 
 
 if __name__ == "__main__":